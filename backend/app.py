@@ -1,34 +1,236 @@
-from flask import Flask, jsonify, request
+import time
+_module_started = time.perf_counter()
+
+from flask import Flask, jsonify, request, Response, stream_with_context, g
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-import gspread
-from google.oauth2.service_account import Credentials
 import os
 from datetime import datetime
 from dotenv import load_dotenv
-import numpy as np
-from scipy.optimize import newton
 import sys
+import importlib
 import os as os_module
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, wait
+import copy
+import hmac
+import uuid
+import pickle
+import sqlite3
+import re
+import heapq
+import hashlib
+import random
+from functools import lru_cache
+from contextlib import contextmanager
+import contextvars
+import asyncio
+from collections import deque
 
 # Force unbuffered output
 os_module.environ['PYTHONUNBUFFERED'] = '1'
 
 load_dotenv()
 
-# Configure logging to ensure output is visible
+# Logging is asynchronous: handlers only enqueue records and a listener thread writes them,
+# so request handlers and hot loops never block on stdout. LOG_FORMAT=json emits one JSON
+# object per line. LOG_SAMPLE_RATES keeps only a fraction of noisy message types, keyed
+# by the record's event (e.g. "cache.hit=0.01,xirr=0.1").
 import logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+import logging.handlers
+import queue
+import atexit
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+
+def parse_sample_rates(spec):
+    """Parse "event=rate,..." into a dict, returning malformed entries separately"""
+    rates, invalid = {}, []
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        event, _, rate = item.partition('=')
+        try:
+            value = float(rate)
+        except ValueError:
+            value = None
+        if not event.strip() or value is None or not 0.0 <= value <= 1.0:
+            invalid.append(item.strip())
+            continue
+        rates[event.strip()] = value
+    return rates, invalid
+
+LOG_SAMPLE_RATES, _invalid_sample_rates = parse_sample_rates(
+    os.environ.get('LOG_SAMPLE_RATES', 'cache.hit=0.01,xirr=0.1'))
+# Values of these variables never reach the logs, nor do keys, tokens or passwords in key=value form
+SECRET_ENV_VARS = ('API_KEY', 'PROFILE_TOKEN', 'GOOGLE_SHEETS_CREDENTIALS')
+SECRET_PATTERNS = [
+    (re.compile(r'-----BEGIN [A-Z ]*PRIVATE KEY-----.*?-----END [A-Z ]*PRIVATE KEY-----', re.S), '[REDACTED]'),
+    (re.compile(r'(?i)((?:api[_-]?key|private_key|token|password|secret)["\']?\s*[:=]\s*["\']?)[^"\'\s,}]+'), r'\1[REDACTED]'),
+]
+
+def redact(text):
+    """Strip secrets from a log line"""
+    for name in SECRET_ENV_VARS:
+        value = os.environ.get(name)
+        if value and len(value) >= 4 and value in text:
+            text = text.replace(value, '[REDACTED]')
+    for pattern, replacement in SECRET_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+class SamplingFilter(logging.Filter):
+    """Drops a share of records per event type before they are formatted or queued"""
+
+    def filter(self, record):
+        rate = LOG_SAMPLE_RATES.get(getattr(record, 'event', None), 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        return redact(super().format(record))
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'event': getattr(record, 'event', None),
+            'message': record.getMessage(),
+            **getattr(record, 'fields', {})
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return redact(json.dumps(entry, default=str, ensure_ascii=False))
+
+_log_output = logging.StreamHandler(sys.stdout)
+_log_output.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else TextFormatter('%(message)s'))
+_log_queue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_output)
+_log_listener.start()
+
+@atexit.register
+def _drain_log_queue():
+    if _log_listener._thread is not None:
+        _log_listener.stop()
+
+def _restart_log_listener():
+    """The listener thread does not survive fork(); give the child its own queue and thread"""
+    global _log_queue, _log_listener
+    _log_queue = queue.SimpleQueue()
+    _queue_handler.queue = _log_queue
+    _log_listener = logging.handlers.QueueListener(_log_queue, _log_output)
+    _log_listener.start()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_log_listener)
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records with their arguments merged; formatting happens on the listener thread"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+_queue_handler = DeferredQueueHandler(_log_queue)
+_queue_handler.addFilter(SamplingFilter())
+logging.basicConfig(level=LOG_LEVEL, handlers=[_queue_handler], force=True)
 logger = logging.getLogger(__name__)
+if _invalid_sample_rates:
+    logger.warning(f"Ignoring malformed LOG_SAMPLE_RATES entries: {', '.join(_invalid_sample_rates)}")
+
+# Startup timing mode: STARTUP_TIMING=1 prints import/init phases and reports them on /
+STARTUP_TIMING = os.environ.get('STARTUP_TIMING', '').lower() in ('1', 'true', 'yes')
+STARTUP_PHASES = []
+
+def record_startup_phase(phase, started):
+    """Record how long a startup phase took (since the perf_counter value started)"""
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    STARTUP_PHASES.append({'phase': phase, 'ms': elapsed_ms})
+    if STARTUP_TIMING:
+        logger.info(f"⏱ {phase}: {elapsed_ms} ms")
+
+record_startup_phase('imports', _module_started)
+
+class LazyModule:
+    """Module proxy that imports on first attribute access, keeping heavy imports off cold starts"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            started = time.perf_counter()
+            self._module = importlib.import_module(self._name)
+            record_startup_phase(f'import {self._name}', started)
+        return getattr(self._module, attr)
+
+# numpy/scipy are only needed once analytics run, not for the health check
+np = LazyModule('numpy')
+scipy_optimize = LazyModule('scipy.optimize')
+
+# Per-request phase timing: code on the hot path wraps its work in timed('<phase>'); the
+# request's exclusive time per phase (nested phases subtracted) ends up in the Server-Timing
+# header and in /api/v1/metrics. Outside a request (background jobs) it is a no-op.
+_request_phases = contextvars.ContextVar('request_phases', default=None)
+_current_phase = contextvars.ContextVar('current_phase', default=None)
+
+@contextmanager
+def timed(phase):
+    phases = _request_phases.get()
+    if phases is None:
+        yield
+        return
+    nested = [0.0]  # time spent in phases started inside this one
+    parent = _current_phase.get()
+    token = _current_phase.set(nested)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _current_phase.reset(token)
+        entry = phases.setdefault(phase, [0.0, 0])
+        entry[0] += max(elapsed - nested[0], 0.0)
+        entry[1] += 1
+        if parent is not None:
+            parent[0] += elapsed
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that reports response serialization as its own request phase"""
+
+    def dumps(self, obj, **kwargs):
+        with timed('serialize'):
+            return super().dumps(obj, **kwargs)
+
+# Comma-separated origins allowed to call the API from a browser ('*' allows any)
+CORS_ORIGINS = [origin.strip() for origin in os.environ.get('CORS_ORIGINS', '*').split(',') if origin.strip()]
+
+def allowed_origin(origin):
+    """Access-Control-Allow-Origin value for a request Origin, or None when it is not allowed"""
+    if '*' in CORS_ORIGINS:
+        return '*'
+    return origin if origin in CORS_ORIGINS else None
 
 app = Flask(__name__)
-CORS(app)
+app.json = TimedJSONProvider(app)
+CORS(app, origins=CORS_ORIGINS)
+
+@app.before_request
+def start_request_timing():
+    """Registered first so the request's total time covers auth and the other hooks too"""
+    g.request_started = time.perf_counter()
+    _request_phases.set({})
+
+@app.teardown_request
+def end_request_timing(exc):
+    _request_phases.set(None)
 
 # Disable Flask's default request logging to use our custom one
 log = logging.getLogger('werkzeug')
@@ -116,8 +318,12 @@ def check_api_key():
         return
 
     key = request.headers.get('X-API-Key')
+    if key is None and request.path == '/api/v1/events':
+        # EventSource cannot set headers, so the stream also takes the key as a query param
+        key = request.args.get('api_key')
     if key != API_KEY:
-        print(f"DEBUG: Auth Failed. Expected: '{API_KEY}' Received: '{key}'")
+        logger.warning("Auth failed for %s %s: %s API key", request.method, request.path,
+                       'invalid' if key else 'missing', extra={'event': 'auth.failed'})
         # For development/local testing, you might want to bypass if API_KEY is not set
         if not API_KEY and app.debug:
             return
@@ -187,28 +393,146 @@ MOCK_TRANSACTIONS = [
 gs_client = None
 sheet = None
 
+class SQLiteCacheStore:
+    """Shared L2 cache in a SQLite file, so all worker processes see the same data and versions.
+
+    Each key holds a pickled value, its fetch timestamp and a version that is
+    bumped atomically on every put/invalidate. Anything with the same
+    get/put/invalidate/touch/stamp methods (e.g. a Redis wrapper) can replace it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._secure(path)
+        self._local = threading.local()
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, version INTEGER NOT NULL, timestamp REAL, data BLOB)')
+
+    @staticmethod
+    def _secure(path):
+        """The store holds pickles, so only this user may be able to write to it"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        for target in (directory, path):
+            if target == path:
+                os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+            info = os.stat(target)
+            if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+                raise PermissionError(f"{target} is not owned by this user")
+            if info.st_mode & 0o022:
+                raise PermissionError(f"{target} is writable by other users")
+        os.chmod(path, 0o600)  # SQLite creates the -wal/-shm files with the same mode
+
+    def _connect(self):
+        # One connection per thread, and a fresh one after a fork (gunicorn preload)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _write(self, key, timestamp, data, if_version=None):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if if_version is not None and self.stamp(key)[0] != if_version:
+                conn.execute('ROLLBACK')
+                return None
+            conn.execute(
+                'INSERT INTO cache (key, version, timestamp, data) VALUES (?, 1, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET version = version + 1, timestamp = excluded.timestamp, data = excluded.data',
+                (key, timestamp, data))
+            version = conn.execute('SELECT version FROM cache WHERE key = ?', (key,)).fetchone()[0]
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return version
+
+    def stamp(self, key):
+        """(version, timestamp) of a key, (0, None) if it was never stored"""
+        row = self._connect().execute('SELECT version, timestamp FROM cache WHERE key = ?', (key,)).fetchone()
+        return row if row else (0, None)
+
+    def get(self, key):
+        """(version, timestamp, pickled data or None)"""
+        row = self._connect().execute('SELECT version, timestamp, data FROM cache WHERE key = ?', (key,)).fetchone()
+        return row if row else (0, None, None)
+
+    def put(self, key, data, timestamp, if_version=None):
+        """Store pickled data and return its new version (None if if_version is no longer current)"""
+        return self._write(key, timestamp, data, if_version)
+
+    def invalidate(self, key):
+        """Drop the data and return the new version"""
+        return self._write(key, None, None)
+
+    def touch(self, key, timestamp):
+        self._connect().execute('UPDATE cache SET timestamp = ? WHERE key = ? AND data IS NOT NULL', (timestamp, key))
+
 # Cache for Google Sheets data with statistics
 class CacheManager:
-    def __init__(self, ttl_seconds=300):
+    """Per-key TTL cache (L1, in process) over an optional shared store (L2, across workers).
+
+    With a shared store, versions come from the store: a local entry is only
+    used while its version matches the shared one, so a write or invalidation
+    in one worker is picked up by the others on their next read.
+    """
+
+    def __init__(self, ttl_seconds=300, key_ttls=None, shared=None):
         self.cache = {
             'transactions': {'data': None, 'timestamp': None, 'size': 0},
-            'goals': {'data': None, 'timestamp': None, 'size': 0}
+            'goals': {'data': None, 'timestamp': None, 'size': 0},
+            'history': {'data': None, 'timestamp': None, 'size': 0}
         }
         self.ttl = ttl_seconds
+        # Per-key TTL overrides (e.g. the append-mostly history sheets)
+        self.key_ttls = key_ttls or {}
         self.stats = {
             'transactions': {'hits': 0, 'misses': 0, 'invalidations': 0},
-            'goals': {'hits': 0, 'misses': 0, 'invalidations': 0}
+            'goals': {'hits': 0, 'misses': 0, 'invalidations': 0},
+            'history': {'hits': 0, 'misses': 0, 'invalidations': 0}
         }
         # Maximum cache size in bytes (10 MB per cache entry)
         self.max_cache_size = 10 * 1024 * 1024
+        # Data version per key, bumped on every set/invalidate so derived views know when to rebuild
+        self.versions = {key: 0 for key in self.cache}
+        self.shared = shared
+        self._sync_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+    
+    def _sync(self, cache_key):
+        """Adopt writes, invalidations and revalidations made by other processes"""
+        if self.shared is None or cache_key not in self.cache:
+            return
+        try:
+            version, timestamp = self.shared.stamp(cache_key)
+            if version == self.versions.get(cache_key, 0):
+                if timestamp and self.cache[cache_key]['data'] is not None and timestamp > self.cache[cache_key]['timestamp']:
+                    self.cache[cache_key]['timestamp'] = timestamp  # revalidated elsewhere
+                return
+            with self._sync_lock:
+                version, timestamp, blob = self.shared.get(cache_key)
+                if blob is None:
+                    self.cache[cache_key] = {'data': None, 'timestamp': None, 'size': 0}
+                else:
+                    self.cache[cache_key] = {'data': pickle.loads(blob), 'timestamp': timestamp, 'size': len(blob)}
+                self.versions[cache_key] = version
+        except Exception as e:
+            logger.warning(f"⚠ Shared cache read failed for '{cache_key}': {e}")
     
     def get_cache_size(self, data):
         """Estimate cache size in bytes"""
         import sys
+        if isinstance(data, dict) and data and all(hasattr(v, 'nbytes') for v in data.values()):
+            # Columnar data (e.g. history frames) reports its own array sizes
+            return sum(v.nbytes for v in data.values())
         return sys.getsizeof(str(data))
     
     def is_valid(self, cache_key):
         """Check if cache is still valid"""
+        self._sync(cache_key)
         if cache_key not in self.cache or self.cache[cache_key]['data'] is None:
             self.stats[cache_key]['misses'] += 1
             return False
@@ -217,7 +541,7 @@ class CacheManager:
         current_time = time.time()
         cache_time = self.cache[cache_key]['timestamp']
         
-        if (current_time - cache_time) < self.ttl:
+        if (current_time - cache_time) < self.key_ttls.get(cache_key, self.ttl):
             self.stats[cache_key]['hits'] += 1
             return True
         else:
@@ -226,32 +550,104 @@ class CacheManager:
     
     def get(self, cache_key):
         """Get cached data if valid"""
-        if self.is_valid(cache_key):
-            return self.cache[cache_key]['data']
+        with timed('cache'):
+            if self.is_valid(cache_key):
+                return self.cache[cache_key]['data']
         return None
     
-    def set(self, cache_key, data):
-        """Set cache data with size check"""
+    def is_fresh(self, cache_key):
+        """Whether get() would hit, without counting towards the hit/miss stats"""
+        self._sync(cache_key)
+        entry = self.cache.get(cache_key)
+        if not entry or entry['data'] is None:
+            return False
+        import time
+        return (time.time() - entry['timestamp']) < self.key_ttls.get(cache_key, self.ttl)
+    
+    def get_stale(self, cache_key):
+        """Get cached data even if the TTL has expired (used for revalidation)"""
+        self._sync(cache_key)
+        entry = self.cache.get(cache_key)
+        return entry['data'] if entry else None
+    
+    def touch(self, cache_key):
+        """Mark cached data as fresh again without changing its version"""
+        import time
+        if cache_key in self.cache and self.cache[cache_key]['data'] is not None:
+            self.cache[cache_key]['timestamp'] = time.time()
+            if self.shared is not None:
+                try:
+                    self.shared.touch(cache_key, self.cache[cache_key]['timestamp'])
+                except Exception as e:
+                    logger.warning(f"⚠ Shared cache touch failed for '{cache_key}': {e}")
+    
+    def set(self, cache_key, data, if_version=None):
+        """Set cache data with size check
+
+        With if_version, the data is only stored while the key is still at that
+        version, so a slow refresh cannot overwrite a write's invalidation.
+        """
         import time
         data_size = self.get_cache_size(data)
         
         # Check if data exceeds max cache size
         if data_size > self.max_cache_size:
-            print(f"⚠ Warning: Cache data for '{cache_key}' ({data_size / 1024 / 1024:.2f} MB) exceeds max size. Not caching.")
+            logger.warning(f"⚠ Warning: Cache data for '{cache_key}' ({data_size / 1024 / 1024:.2f} MB) exceeds max size. Not caching.")
             return False
         
-        self.cache[cache_key] = {
-            'data': data,
-            'timestamp': time.time(),
-            'size': data_size
-        }
-        return True
+        with self._write_lock:
+            if if_version is not None and self.version(cache_key) != if_version:
+                return False
+            entry = {
+                'data': data,
+                'timestamp': time.time(),
+                'size': data_size
+            }
+            if self.shared is not None:
+                try:
+                    version = self.shared.put(
+                        cache_key, pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL), entry['timestamp'], if_version)
+                    if version is None:
+                        return False
+                    self.cache[cache_key] = entry
+                    self.versions[cache_key] = version
+                    return True
+                except Exception as e:
+                    logger.warning(f"⚠ Shared cache write failed for '{cache_key}': {e}")
+            self.cache[cache_key] = entry
+            self.versions[cache_key] = self.versions.get(cache_key, 0) + 1
+            return True
     
     def invalidate(self, cache_key):
         """Invalidate cache for a specific key"""
-        if cache_key in self.cache:
+        if cache_key not in self.cache:
+            return
+        with self._write_lock:
             self.cache[cache_key] = {'data': None, 'timestamp': None, 'size': 0}
             self.stats[cache_key]['invalidations'] += 1
+            if self.shared is not None:
+                try:
+                    self.versions[cache_key] = self.shared.invalidate(cache_key)
+                    return
+                except Exception as e:
+                    logger.warning(f"⚠ Shared cache invalidation failed for '{cache_key}': {e}")
+            self.versions[cache_key] = self.versions.get(cache_key, 0) + 1
+    
+    def bump_version(self, cache_key):
+        """Advance the version of data that changed but is not cached (e.g. over the size limit)"""
+        if self.shared is not None:
+            try:
+                self.versions[cache_key] = self.shared.invalidate(cache_key)
+                return self.versions[cache_key]
+            except Exception as e:
+                logger.warning(f"⚠ Shared cache version bump failed for '{cache_key}': {e}")
+        self.versions[cache_key] = self.versions.get(cache_key, 0) + 1
+        return self.versions[cache_key]
+    
+    def version(self, cache_key):
+        """Get the current data version for a cache key"""
+        self._sync(cache_key)
+        return self.versions.get(cache_key, 0)
     
     def get_stats(self):
         """Get cache statistics"""
@@ -265,13 +661,28 @@ class CacheManager:
                 'invalidations': self.stats[key]['invalidations'],
                 'hit_rate': f"{hit_rate:.2f}%",
                 'cached': self.cache[key]['data'] is not None,
+                'version': self.versions.get(key, 0),
                 'size_kb': self.cache[key]['size'] / 1024 if self.cache[key]['size'] > 0 else 0
             }
         return stats_summary
 
+# History sheets are append-mostly and expensive to parse, so they are kept longer
+# and revalidated incrementally when the TTL expires
+HISTORY_CACHE_TTL = int(os.environ.get('HISTORY_CACHE_TTL', 900))
+
+# Optional cache shared by all worker processes under gunicorn, in a directory only this user can
+# write to (e.g. ~/.cache/wealth-app/cache.sqlite); world-writable locations such as /tmp are refused
+SHARED_CACHE_PATH = os.environ.get('SHARED_CACHE_PATH')
+shared_cache = None
+if SHARED_CACHE_PATH:
+    try:
+        shared_cache = SQLiteCacheStore(SHARED_CACHE_PATH)
+    except Exception as e:
+        logger.warning(f"⚠ Shared cache unavailable at {SHARED_CACHE_PATH}, using per-process cache: {e}")
+
 # Initialize cache manager with 5-minute TTL (300 seconds)
 # This balances freshness with API call reduction
-cache_manager = CacheManager(ttl_seconds=300)
+cache_manager = CacheManager(ttl_seconds=300, key_ttls={'history': HISTORY_CACHE_TTL}, shared=shared_cache)
 
 SHEET_NAME = os.environ.get('SHEET_NAME', 'WealthManagement')
 
@@ -279,6 +690,8 @@ def init_google_sheets():
     """Initialize Google Sheets client using environment variable or file."""
     global gs_client, sheet
     try:
+        import gspread
+        from google.oauth2.service_account import Credentials
         scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
         
         # 1. Try loading from Environment Variable (Best for Vercel/Production)
@@ -293,10 +706,10 @@ def init_google_sheets():
                 
                 # Open the sandbox file
                 sheet = gs_client.open(SHEET_NAME)
-                print("✓ Connected to Google Sheets using Environment Variable")
+                logger.info("✓ Connected to Google Sheets using Environment Variable")
                 return True
             except Exception as e:
-                print(f"Error parsing GOOGLE_SHEETS_CREDENTIALS: {e}")
+                logger.error(f"Error parsing GOOGLE_SHEETS_CREDENTIALS: {e}")
                 # Fallthrough to try file
 
         # 2. Try loading from local file (Best for Local Development)
@@ -308,20 +721,20 @@ def init_google_sheets():
             
             # Open the sandbox file
             sheet = gs_client.open(SHEET_NAME)
-            print(f"✓ Connected to Google Sheets using {creds_file}")
+            logger.info(f"✓ Connected to Google Sheets using {creds_file}")
             return True
         elif os.path.exists('key.json'):
              creds = Credentials.from_service_account_file('key.json', scopes=scope)
              gs_client = gspread.authorize(creds)
              sheet = gs_client.open(SHEET_NAME)
-             print("✓ Connected to Google Sheets using key.json")
+             logger.info("✓ Connected to Google Sheets using key.json")
              return True
 
-        print("⚠ Could not find credentials in Env Var or local JSON file.")
+        logger.warning("⚠ Could not find credentials in Env Var or local JSON file.")
         return False
         
     except Exception as e:
-        print(f"Error connecting to Google Sheets: {e}")
+        logger.error(f"Error connecting to Google Sheets: {e}")
         return False
 
 def invalidate_cache(cache_key):
@@ -332,6 +745,32 @@ def is_cache_valid(cache_key):
     """Check if cache is still valid"""
     return cache_manager.is_valid(cache_key)
 
+# Date formats seen in the sheet (ISO, Indian, US and "15-Jan-24" styles)
+DATE_FORMATS = ['%Y-%m-%d', '%d-%m-%Y', '%m/%d/%Y', '%d/%m/%Y', '%d-%b-%y', '%d-%b-%Y', '%d-%B-%y', '%d-%B-%Y']
+
+def parse_date(value):
+    """Parse a sheet date string, returning a datetime or None if it is not recognised"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return _parse_date_string(str(value).strip())
+
+@lru_cache(maxsize=65536)
+def _parse_date_string(value):
+    # Ledgers repeat the same dates many times, so remember each string's result.
+    # Only try formats with the right separator and month style - failed strptime calls are slow.
+    slash = '/' in value
+    named_month = any(c.isalpha() for c in value)
+    for fmt in DATE_FORMATS:
+        if ('/' in fmt) != slash or (('%b' in fmt or '%B' in fmt) != named_month):
+            continue
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
 def calculate_xirr(transactions, current_date=None):
     """
     Calculate XIRR (Extended Internal Rate of Return) for a set of transactions
@@ -445,7 +884,7 @@ def calculate_xirr(transactions, current_date=None):
                         except:
                             continue
         except Exception as e:
-            print(f"Error processing transaction for XIRR: {e}")
+            logger.warning("Error processing transaction for XIRR: %s", e, extra={'event': 'xirr'})
             continue
     
     
@@ -456,7 +895,7 @@ def calculate_xirr(transactions, current_date=None):
         cash_flows.append((valuation_date, total_current_value))
     
     if len(cash_flows) < 2:
-        print(f"XIRR failed: Insufficient cash flows ({len(cash_flows)})")
+        logger.debug("XIRR failed: Insufficient cash flows (%d)", len(cash_flows), extra={'event': 'xirr'})
         return None
     
     # Sort by date
@@ -484,7 +923,7 @@ def calculate_xirr(transactions, current_date=None):
         guess = 0.1
         
         # Use Newton's method to find the rate where NPV = 0
-        xirr_rate = newton(
+        xirr_rate = scipy_optimize.newton(
             lambda r: npv(r, dates_in_years, amounts),
             guess,
             fprime=lambda r: npv_derivative(r, dates_in_years, amounts),
@@ -499,19 +938,355 @@ def calculate_xirr(transactions, current_date=None):
         if -100 <= xirr_percentage <= 1000:
             return round(xirr_percentage, 2)
         else:
-            print(f"XIRR out of bounds: {xirr_percentage}")
+            logger.info("XIRR out of bounds: %s", xirr_percentage, extra={'event': 'xirr'})
             return None
     except Exception as e:
-        print(f"XIRR calculation failed during optimization: {e}")
+        logger.info("XIRR calculation failed during optimization: %s", e, extra={'event': 'xirr'})
+        return None
+
+# XIRR solves for independent groups (per class, per security, ...) are pure Python and hold
+# the GIL, so large batches are spread over a process pool. XIRR_EXECUTOR: process | thread | inline
+XIRR_EXECUTOR = os.environ.get('XIRR_EXECUTOR', 'process')
+XIRR_WORKERS = int(os.environ.get('XIRR_WORKERS', min(os.cpu_count() or 1, 8)))
+XIRR_PARALLEL_MIN_ROWS = int(os.environ.get('XIRR_PARALLEL_MIN_ROWS', 2000))  # smaller batches run inline
+_xirr_pool = None
+_xirr_pool_lock = threading.Lock()
+
+def _xirr_chunk(groups):
+    """Worker entry point: XIRR for each list of transactions in the chunk"""
+    return [calculate_xirr(transactions) for transactions in groups]
+
+def get_xirr_pool():
+    """Lazily created XIRR executor, or None when batches should run inline"""
+    global _xirr_pool, XIRR_EXECUTOR
+    if XIRR_WORKERS <= 1 or XIRR_EXECUTOR == 'inline':
         return None
+    with _xirr_pool_lock:
+        if _xirr_pool is None:
+            try:
+                if XIRR_EXECUTOR == 'thread':
+                    _xirr_pool = ThreadPoolExecutor(max_workers=XIRR_WORKERS, thread_name_prefix='xirr')
+                else:
+                    import multiprocessing
+                    method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else None
+                    _xirr_pool = ProcessPoolExecutor(max_workers=XIRR_WORKERS, mp_context=multiprocessing.get_context(method))
+                logger.info(f"✓ XIRR executor: {XIRR_EXECUTOR} pool with {XIRR_WORKERS} workers")
+            except (OSError, ValueError, NotImplementedError) as e:
+                # e.g. serverless runtimes without /dev/shm
+                logger.warning(f"⚠ XIRR pool unavailable, solving inline: {e}")
+                XIRR_EXECUTOR = 'inline'
+                return None
+        return _xirr_pool
+
+def calculate_xirr_batch(groups):
+    """XIRR for many independent transaction lists, in input order.
+
+    Groups are packed largest-first into about four chunks per worker so one
+    big security does not leave the other workers idle. Batches smaller than
+    XIRR_PARALLEL_MIN_ROWS are solved inline, where pickling would cost more
+    than the solves.
+    """
+    total_rows = sum(len(g) for g in groups)
+    pool = get_xirr_pool() if len(groups) > 1 and total_rows >= XIRR_PARALLEL_MIN_ROWS else None
+    if pool is None:
+        return _xirr_chunk(groups)
+
+    target = max(total_rows // (XIRR_WORKERS * 4), 1)
+    chunks, current, size = [], [], 0
+    for index in sorted(range(len(groups)), key=lambda i: len(groups[i]), reverse=True):
+        current.append(index)
+        size += len(groups[index])
+        if size >= target:
+            chunks.append(current)
+            current, size = [], 0
+    if current:
+        chunks.append(current)
+
+    results = [None] * len(groups)
+    try:
+        futures = [(chunk, pool.submit(_xirr_chunk, [groups[i] for i in chunk])) for chunk in chunks]
+        for chunk, future in futures:
+            for index, value in zip(chunk, future.result()):
+                results[index] = value
+    except Exception as e:
+        logger.warning(f"⚠ Parallel XIRR failed, solving inline: {e}")
+        return _xirr_chunk(groups)
+    return results
+
+# Per-request HTTP timeout for Sheets reads, so one slow fetch cannot hold a request indefinitely
+SHEETS_FETCH_TIMEOUT = float(os.environ.get('SHEETS_FETCH_TIMEOUT', 20))
+SHEETS_FETCH_WORKERS = int(os.environ.get('SHEETS_FETCH_WORKERS', 4))
+# Keep-alive connections kept open to the Sheets API (shared by fetch threads and request handlers)
+SHEETS_HTTP_POOL_SIZE = int(os.environ.get('SHEETS_HTTP_POOL_SIZE', 16))
+
+# When to connect to Google Sheets: background (warm in a thread at startup), lazy (on the
+# first data request) or eager (block startup, the old behaviour)
+SHEETS_CONNECT = os.environ.get('SHEETS_CONNECT', 'background')
+_sheets_ready = threading.Event()
+_sheets_connect_lock = threading.Lock()
+
+def connect_google_sheets():
+    """Connect to Google Sheets once; concurrent callers wait for the first attempt"""
+    with _sheets_connect_lock:
+        if _sheets_ready.is_set():
+            return
+        started = time.perf_counter()
+        if init_google_sheets():
+            gs_client.set_timeout(SHEETS_FETCH_TIMEOUT)
+            from requests.adapters import HTTPAdapter
+            gs_client.session.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=SHEETS_HTTP_POOL_SIZE))
+            sheets_guard.install(gs_client)
+            if sheet is not None:
+                _workbooks.setdefault(SHEET_NAME, sheet)
+        record_startup_phase('sheets connect', started)
+        _sheets_ready.set()
+
+def ensure_google_sheets():
+    """Block until the Sheets connection attempt has finished (mock mode if it failed)"""
+    if not _sheets_ready.is_set():
+        connect_google_sheets()
+
+def _reset_sheets_connect():
+    """A fork during a connect copies the lock held by a thread the child does not have.
 
-# Try to initialize Google Sheets on startup
-init_google_sheets()
+    Give the child a fresh lock and, if the parent had not finished connecting,
+    start the attempt again in the child.
+    """
+    global _sheets_connect_lock, _connect_future
+    _sheets_connect_lock = threading.Lock()
+    if _sheets_ready.is_set():
+        return
+    _connect_future = None
+    if SHEETS_CONNECT == 'background':
+        threading.Thread(target=connect_google_sheets, name='sheets-connect', daemon=True).start()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_sheets_connect)
 
 # ============================================================
 # Google Sheets Helper Functions
 # ============================================================
 
+# Sheets API guard: retries, quota metering and a circuit breaker around every gspread request
+SHEETS_QUOTA_PER_MINUTE = int(os.environ.get('SHEETS_QUOTA_PER_MINUTE', 60))  # read requests per user per minute
+SHEETS_MAX_RETRIES = int(os.environ.get('SHEETS_MAX_RETRIES', 3))
+SHEETS_RETRY_BASE_DELAY = float(os.environ.get('SHEETS_RETRY_BASE_DELAY', 1.0))
+SHEETS_RETRY_MAX_DELAY = float(os.environ.get('SHEETS_RETRY_MAX_DELAY', 30.0))
+SHEETS_BREAKER_THRESHOLD = int(os.environ.get('SHEETS_BREAKER_THRESHOLD', 5))  # consecutive failures
+SHEETS_BREAKER_COOLDOWN = float(os.environ.get('SHEETS_BREAKER_COOLDOWN', 60))
+
+class SheetsUnavailableError(Exception):
+    """Raised without calling the API while the circuit breaker is open"""
+
+class SheetsGuard:
+    """Wraps the gspread client's HTTP requests with retry/backoff, quota metering and a circuit breaker.
+
+    Rate limits (429) are retried for every method; 5xx and network errors only
+    for GETs, since a failed write may have been applied. After
+    SHEETS_BREAKER_THRESHOLD consecutive failures the circuit opens and calls
+    fail fast for SHEETS_BREAKER_COOLDOWN seconds, so readers serve their last
+    good data; then a single trial request decides whether it closes again.
+    """
+
+    ERROR_KINDS = ('rate_limit', 'server', 'network', 'client', 'circuit_open')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.window = deque()  # request start times within the last minute
+        self.latencies = deque(maxlen=500)  # ms, most recent requests
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.errors = {kind: 0 for kind in self.ERROR_KINDS}
+        self.failures = 0
+        self.state = 'closed'
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def install(self, client):
+        """Route all of the client's API requests (spreadsheets, worksheets, Drive) through the guard"""
+        send = client.request
+
+        def guarded_request(method, endpoint, *args, **kwargs):
+            return self.call(method, lambda: send(method, endpoint, *args, **kwargs))
+        client.request = guarded_request
+
+    def classify(self, error):
+        from gspread.exceptions import APIError
+        import requests
+        if isinstance(error, APIError):
+            status = error.response.status_code
+            if status == 429:
+                return 'rate_limit'
+            return 'server' if status >= 500 else 'client'
+        if isinstance(error, requests.exceptions.RequestException):
+            return 'network'
+        return 'client'
+
+    def _enter_circuit(self):
+        with self._lock:
+            if self.state == 'closed':
+                return
+            if self.state == 'open' and time.time() - self.opened_at >= SHEETS_BREAKER_COOLDOWN:
+                self.state = 'half-open'
+            if self.state == 'half-open' and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return
+            self.errors['circuit_open'] += 1
+        raise SheetsUnavailableError("Google Sheets circuit breaker is open")
+
+    def _settle(self, failed):
+        with self._lock:
+            self.trial_in_flight = False
+            if not failed:
+                self.failures = 0
+                if self.state != 'closed':
+                    logger.info("✓ Google Sheets circuit breaker closed")
+                self.state = 'closed'
+                return
+            self.failures += 1
+            if self.state == 'half-open' or self.failures >= SHEETS_BREAKER_THRESHOLD:
+                if self.state != 'open':
+                    logger.warning(f"⚠ Google Sheets circuit breaker opened after {self.failures} failures")
+                self.state = 'open'
+                self.opened_at = time.time()
+
+    def _meter(self):
+        """Count the request against the per-minute quota, waiting for a free slot when it is used up"""
+        with self._lock:
+            now = time.time()
+            while self.window and now - self.window[0] >= 60:
+                self.window.popleft()
+            wait = 0.0
+            if len(self.window) >= SHEETS_QUOTA_PER_MINUTE:
+                wait = 60 - (now - self.window[-SHEETS_QUOTA_PER_MINUTE])
+                self.throttled += 1
+            self.window.append(now + wait)
+            self.calls += 1
+        if wait > 0:
+            time.sleep(wait)
+
+    def _backoff(self, attempt, error):
+        retry_after = getattr(getattr(error, 'response', None), 'headers', {}).get('Retry-After')
+        if retry_after and str(retry_after).isdigit():
+            return min(float(retry_after), SHEETS_RETRY_MAX_DELAY)
+        delay = min(SHEETS_RETRY_BASE_DELAY * 2 ** (attempt - 1), SHEETS_RETRY_MAX_DELAY)
+        return delay * random.uniform(0.5, 1.0)
+
+    def call(self, method, send):
+        with timed('sheets'):
+            return self._call(method, send)
+
+    def _call(self, method, send):
+        self._enter_circuit()
+        attempt = 0
+        while True:
+            self._meter()
+            started = time.perf_counter()
+            try:
+                response = send()
+            except Exception as e:
+                kind = self.classify(e)
+                with self._lock:
+                    self.latencies.append((time.perf_counter() - started) * 1000)
+                    self.errors[kind] += 1
+                retryable = kind == 'rate_limit' or (kind in ('server', 'network') and method.lower() == 'get')
+                if retryable and attempt < SHEETS_MAX_RETRIES:
+                    attempt += 1
+                    with self._lock:
+                        self.retries += 1
+                    time.sleep(self._backoff(attempt, e))
+                    continue
+                # Client errors (bad range, missing sheet) say nothing about the API's health
+                self._settle(failed=kind != 'client')
+                raise
+            with self._lock:
+                self.latencies.append((time.perf_counter() - started) * 1000)
+            self._settle(failed=False)
+            return response
+
+    def get_stats(self):
+        with self._lock:
+            latencies = np.array(self.latencies) if self.latencies else None
+            now = time.time()
+            return {
+                'circuit': self.state,
+                'consecutiveFailures': self.failures,
+                'calls': self.calls,
+                'callsLastMinute': sum(1 for t in self.window if now - t < 60),
+                'quotaPerMinute': SHEETS_QUOTA_PER_MINUTE,
+                'retries': self.retries,
+                'throttled': self.throttled,
+                'errors': dict(self.errors),
+                'latencyMs': {
+                    'avg': round(float(latencies.mean()), 1),
+                    'p50': round(float(np.percentile(latencies, 50)), 1),
+                    'p95': round(float(np.percentile(latencies, 95)), 1),
+                    'max': round(float(latencies.max()), 1)
+                } if latencies is not None else None
+            }
+
+sheets_guard = SheetsGuard()
+
+_fetch_worker = threading.local()
+_fetch_pool = ThreadPoolExecutor(max_workers=SHEETS_FETCH_WORKERS, thread_name_prefix='sheets-fetch',
+                                 initializer=lambda: setattr(_fetch_worker, 'active', True))
+_workbooks = {}
+_workbooks_lock = threading.Lock()
+
+def open_workbook(sheet_name=None):
+    """Open the spreadsheet once per name; opening costs a Drive lookup and a metadata fetch"""
+    sheet_name = sheet_name or os.getenv('SHEET_NAME', 'WealthManagement')
+    with _workbooks_lock:
+        workbook = _workbooks.get(sheet_name)
+    if workbook is None:
+        workbook = gs_client.open(sheet_name)
+        with _workbooks_lock:
+            _workbooks[sheet_name] = workbook
+    return workbook
+
+def fetch_parallel(fetches, timeout=SHEETS_FETCH_TIMEOUT):
+    """Run independent Sheets reads concurrently.
+
+    fetches maps a name to a zero-argument callable. Returns {name: result},
+    with None for reads that raised or did not finish within the timeout, so
+    cold-path latency is the slowest fetch rather than the sum of all of them.
+    Called from a fetch-pool thread (e.g. history loads inside prefetch) the
+    reads run inline: queueing them behind the outer jobs could fill every
+    worker and leave the inner reads waiting out the timeout.
+    """
+    if len(fetches) <= 1 or getattr(_fetch_worker, 'active', False):
+        # Nothing to overlap, or already on a pool thread: skip the pool hop
+        results = {}
+        for name, fetch in fetches.items():
+            try:
+                results[name] = fetch()
+            except Exception as e:
+                logger.error(f"Error fetching {name}: {e}")
+                results[name] = None
+        return results
+
+    # Run each fetch in a copy of the request's context so its phases are still timed
+    futures = {name: _fetch_pool.submit(contextvars.copy_context().run, fetch) for name, fetch in fetches.items()}
+    wait(futures.values(), timeout=timeout)
+    results = {}
+    for name, future in futures.items():
+        if not future.done():
+            logger.warning(f"⚠ Fetching {name} timed out after {timeout}s")
+            results[name] = None
+        elif future.exception() is not None:
+            logger.error(f"Error fetching {name}: {future.exception()}")
+            results[name] = None
+        else:
+            results[name] = future.result()
+    return results
+
+def batch_get_values(workbook, titles):
+    """All cell values of several worksheets in a single values_batch_get round trip"""
+    ranges = ["'{}'".format(title.replace("'", "''")) for title in titles]
+    response = workbook.values_batch_get(ranges)
+    return {title: value_range.get('values', []) for title, value_range in zip(titles, response.get('valueRanges', []))}
+
 def get_or_create_worksheet(workbook_name, worksheet_name, headers):
     """Get existing worksheet or create new one with headers"""
     try:
@@ -524,7 +1299,7 @@ def get_or_create_worksheet(workbook_name, worksheet_name, headers):
             worksheet.append_row(headers)
         return worksheet
     except Exception as e:
-        print(f"Error accessing worksheet: {e}")
+        logger.error(f"Error accessing worksheet: {e}")
         return None
 
 def write_transaction_to_sheets(transaction):
@@ -550,20 +1325,19 @@ def write_transaction_to_sheets(transaction):
             
             row = [
                 transaction['id'],
-                transaction.get('fy', ''),  # Financial year
+                transaction.get('fy') or financial_year(parse_date(transaction.get('buyDate', transaction.get('date', '')))),  # Financial year
                 transaction.get('account', 'Investment'),  # Account
                 transaction.get('assetClass', ''),  # Maps to AssetType
                 transaction.get('type', 'BUY'),  # Maps to TranType
                 'FALSE',  # Realised - FALSE for active holdings
                 transaction.get('security', ''),
-                transaction.get('security', ''),
                 quantity,
                 transaction.get('buyDate', transaction.get('date', '')),  # BuyDate
                 transaction.get('sellDate', ''),  # SellDate
                 buy_rate,
                 '',  # SellRate - empty until sold
                 current_rate,
-                '',  # Holding Period - can be calculated
+                holding_period_days(transaction.get('buyDate', transaction.get('date')), transaction.get('sellDate')),  # Holding Period
                 gain_loss,
                 buy_value,
                 '',  # SellValue - empty until sold
@@ -574,7 +1348,7 @@ def write_transaction_to_sheets(transaction):
             invalidate_cache('transactions')  # Invalidate cache after write
             return True
     except Exception as e:
-        print(f"Error writing transaction to sheets: {e}")
+        logger.error(f"Error writing transaction to sheets: {e}")
     return False
 
 def read_transactions_from_sheets():
@@ -585,13 +1359,32 @@ def read_transactions_from_sheets():
     # Check cache first
     cached_data = cache_manager.get('transactions')
     if cached_data is not None:
-        print("✓ Using cached transactions data")
+        logger.debug("✓ Using cached transactions data", extra={'event': 'cache.hit'})
         return cached_data
     
+    with timed('parse'):
+        transactions = fetch_transactions_from_sheets()
+    stale = cache_manager.get_stale('transactions')
+    if transactions is None:
+        # Quota, outage or open circuit: keep serving the last good data rather than an empty portfolio
+        if stale is None:
+            stale = transaction_changes.ledger  # a ledger too large to cache
+        return stale if stale is not None else []
+    if transactions == stale:
+        # Unchanged sheet: keep the version so the snapshot and event subscribers stay current
+        cache_manager.touch('transactions')
+        return stale
+    # Update cache
+    cache_manager.set('transactions', transactions)
+    logger.info(f"✓ Cached {len(transactions)} transactions ({cache_manager.cache['transactions']['size'] / 1024:.2f} KB)")
+    return transactions
+
+def fetch_transactions_from_sheets():
+    """Fetch and parse the Transactions worksheet, bypassing the cache (None on error)"""
     try:
         import time
         sheet_name = os.getenv('SHEET_NAME', 'WealthManagement')
-        workbook = gs_client.open(sheet_name)
+        workbook = open_workbook(sheet_name)
         try:
             worksheet = workbook.worksheet('Transactions')
             records = worksheet.get_all_records()
@@ -673,19 +1466,15 @@ def read_transactions_from_sheets():
                         'notes': ''
                     })
                 except Exception as e:
-                    print(f"Error parsing transaction record: {e}, record: {record}")
+                    logger.warning("Error parsing transaction record: %s, record: %s", e, record, extra={'event': 'parse.error'})
                     continue
-            
-            # Update cache
-            cache_manager.set('transactions', transactions)
-            print(f"✓ Cached {len(transactions)} transactions ({cache_manager.cache['transactions']['size'] / 1024:.2f} KB)")
             return transactions
         except Exception as e:
-            print(f"Error reading Transactions worksheet: {e}")
-            return []
+            logger.error(f"Error reading Transactions worksheet: {e}")
+            return None
     except Exception as e:
-        print(f"Error reading transactions from sheets: {e}")
-        return []
+        logger.error(f"Error reading transactions from sheets: {e}")
+        return None
 
 def write_goal_to_sheets(goal):
     """Write a goal to Google Sheets"""
@@ -710,7 +1499,7 @@ def write_goal_to_sheets(goal):
             invalidate_cache('goals')  # Invalidate cache after write
             return True
     except Exception as e:
-        print(f"Error writing goal to sheets: {e}")
+        logger.error(f"Error writing goal to sheets: {e}")
     return False
 
 def read_goals_from_sheets():
@@ -721,13 +1510,28 @@ def read_goals_from_sheets():
     # Check cache first
     cached_data = cache_manager.get('goals')
     if cached_data is not None:
-        print("✓ Using cached goals data")
+        logger.debug("✓ Using cached goals data", extra={'event': 'cache.hit'})
         return cached_data
     
+    with timed('parse'):
+        goals = fetch_goals_from_sheets()
+    stale = cache_manager.get_stale('goals')
+    if goals is None:
+        return stale if stale is not None else []
+    if goals == stale:
+        cache_manager.touch('goals')
+        return stale
+    # Update cache
+    cache_manager.set('goals', goals)
+    logger.info(f"✓ Cached {len(goals)} goals ({cache_manager.cache['goals']['size'] / 1024:.2f} KB)")
+    return goals
+
+def fetch_goals_from_sheets():
+    """Fetch and parse the Goals worksheet, bypassing the cache (None on error)"""
     try:
         import time
         sheet_name = os.getenv('SHEET_NAME', 'WealthManagement')
-        workbook = gs_client.open(sheet_name)
+        workbook = open_workbook(sheet_name)
         try:
             worksheet = workbook.worksheet('Goals')
             records = worksheet.get_all_records()
@@ -755,19 +1559,15 @@ def read_goals_from_sheets():
                         'progress': progress
                     })
                 except Exception as e:
-                    print(f"Error parsing goal record: {e}, record: {record}")
+                    logger.warning("Error parsing goal record: %s, record: %s", e, record, extra={'event': 'parse.error'})
                     continue
-            
-            # Update cache
-            cache_manager.set('goals', goals)
-            print(f"✓ Cached {len(goals)} goals ({cache_manager.cache['goals']['size'] / 1024:.2f} KB)")
             return goals
         except Exception as e:
-            print(f"Error reading Goals worksheet: {e}")
-            return []
+            logger.error(f"Error reading Goals worksheet: {e}")
+            return None
     except Exception as e:
-        print(f"Error reading goals from sheets: {e}")
-        return []
+        logger.error(f"Error reading goals from sheets: {e}")
+        return None
 
 def update_transaction_in_sheets(txn_id, updated_data):
     """Update a transaction in Google Sheets"""
@@ -828,7 +1628,7 @@ def update_transaction_in_sheets(txn_id, updated_data):
             invalidate_cache('transactions')
             return True
     except Exception as e:
-        print(f"Error updating transaction in sheets: {e}")
+        logger.error(f"Error updating transaction in sheets: {e}")
     return False
 
 def delete_transaction_from_sheets(txn_id):
@@ -844,9 +1644,10 @@ def delete_transaction_from_sheets(txn_id):
         cell = worksheet.find(txn_id)
         if cell:
             worksheet.delete_rows(cell.row)
+            invalidate_cache('transactions')
             return True
     except Exception as e:
-        print(f"Error deleting transaction from sheets: {e}")
+        logger.error(f"Error deleting transaction from sheets: {e}")
     return False
 
 def update_goal_in_sheets(goal_id, updated_data):
@@ -872,9 +1673,10 @@ def update_goal_in_sheets(goal_id, updated_data):
                 updated_data['targetDate'],
                 updated_data.get('progress', 0)
             ]])
+            invalidate_cache('goals')
             return True
     except Exception as e:
-        print(f"Error updating goal in sheets: {e}")
+        logger.error(f"Error updating goal in sheets: {e}")
     return False
 
 def delete_goal_from_sheets(goal_id):
@@ -890,162 +1692,290 @@ def delete_goal_from_sheets(goal_id):
         cell = worksheet.find(goal_id)
         if cell:
             worksheet.delete_rows(cell.row)
+            invalidate_cache('goals')
             return True
     except Exception as e:
-        print(f"Error deleting goal from sheets: {e}")
+        logger.error(f"Error deleting goal from sheets: {e}")
     return False
 
 # ============================================================
-# API ENDPOINTS
+# Portfolio Snapshot
 # ============================================================
 
-@app.after_request
-def log_request(response):
-    """Log all HTTP requests"""
-    from datetime import datetime
-    timestamp = datetime.now().strftime('%H:%M:%S')
-    logger.info(f"\n{'='*60}")
-    logger.info(f"[{timestamp}] {request.method} {request.path} → {response.status_code}")
-    logger.info(f"{'='*60}")
-    sys.stdout.flush()
-    return response
+# Dates inside the snapshot are stored as days since 1970-01-01
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
 
-@app.route('/')
-def home():
-    return jsonify({
-        "message": "Wealth Management API",
-        "version": "1.0.0",
-        "status": "running",
-        "mode": "mock" if not gs_client else "google-sheets"
-    })
+def url_key(name):
+    """URL-friendly key for a label, e.g. 'Equity MF' -> 'equity_mf'"""
+    return re.sub(r'[^a-z0-9]+', '_', str(name).lower()).strip('_')
 
-@app.route('/api/v1/cache/stats', methods=['GET'])
-def get_cache_stats():
-    """Get cache statistics"""
-    stats = cache_manager.get_stats()
-    return jsonify({
-        "cache_ttl_seconds": cache_manager.ttl,
-        "max_cache_size_mb": cache_manager.max_cache_size / 1024 / 1024,
-        "statistics": stats
-    })
+# Transaction types that represent money put into a holding
+INVESTMENT_TYPES = ['Invest', 'Trade', 'Buy', 'BUY', 'SIP', 'SIP Installment', 'Purchase']
+# Transaction types recorded as a separate sale row
+SELL_TYPES = ['Sell', 'SELL', 'Redeem', 'Redemption', 'Withdrawal']
 
-# Portfolio Endpoints
-@app.route('/api/v1/portfolio/overview', methods=['GET'])
-def get_portfolio_overview():
-    """Get portfolio overview with total value and asset breakdown"""
-    if gs_client:
-        # Calculate from Google Sheets transactions
-        transactions = read_transactions_from_sheets()
-        print(f"Total transactions read: {len(transactions)}")
-        
-        # Group by asset class - only count unrealized (active) holdings
-        asset_summary = {}
-        total_invested = 0
-        total_current_value = 0
-        total_realized_pl = 0
-        total_dividends = 0
-        realized_count = 0
-        unrealized_count = 0
-        
-        for txn in transactions:
+def encode_categories(values):
+    """Encode a list of labels as integer codes (first-appearance order) plus the label list"""
+    index = {}
+    codes = np.empty(len(values), dtype=np.int64)
+    for i, value in enumerate(values):
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(index)
+        codes[i] = code
+    return list(index), codes
+
+def group_indices(codes, mask=None):
+    """Split row indices by code, returning {code: index array} (rows keep ledger order)"""
+    rows = np.flatnonzero(mask) if mask is not None else np.arange(len(codes))
+    if len(rows) == 0:
+        return {}
+    order = np.argsort(codes[rows], kind='stable')
+    rows = rows[order]
+    sorted_codes = codes[rows]
+    boundaries = np.flatnonzero(np.diff(sorted_codes)) + 1
+    return {int(group[0]): idx for group, idx in zip(np.split(sorted_codes, boundaries), np.split(rows, boundaries))}
+
+class PortfolioSnapshot:
+    """Columnar view of one version of the transaction ledger.
+
+    All portfolio endpoints read from the same snapshot so a single request
+    (or a bundled dashboard request) aggregates the ledger once, and XIRRs
+    are solved at most once per group per data version.
+    """
+
+    def __init__(self, transactions, version=None):
+        self.transactions = transactions
+        self.version = version
+        n = len(transactions)
+
+        classes, securities, accounts = [], [], []
+        self.realised = np.zeros(n, dtype=bool)
+        self.open = np.zeros(n, dtype=bool)  # Realised explicitly FALSE
+        self.is_investment = np.zeros(n, dtype=bool)
+        self.is_dividend = np.zeros(n, dtype=bool)
+        self.is_interest = np.zeros(n, dtype=bool)
+        self.is_sell = np.zeros(n, dtype=bool)
+        self.units = np.zeros(n)
+        self.invested = np.zeros(n)
+        self.value = np.zeros(n)
+        self.gain_loss = np.zeros(n)
+        self.realized_invested = np.zeros(n)
+        self.sell_value = np.zeros(n)
+        self.buy_day = np.full(n, np.nan)  # days since epoch, NaN when the date is missing
+        self.sell_day = np.full(n, np.nan)
+
+        for i, txn in enumerate(transactions):
             realised = str(txn.get('realised', 'FALSE')).upper()
             txn_type = txn.get('type', 'Invest')
-            asset_class = txn.get('assetClass', 'Other')
-            
-            if asset_class not in asset_summary:
-                asset_summary[asset_class] = {
-                    'invested': 0, 
-                    'current_value': 0, 
-                    'count': 0,
-                    'realized_pl': 0,
-                    'dividends': 0
-                }
-            
-            # Handle realized transactions separately for P/L
-            if realised == 'TRUE':
-                realized_count += 1
-                
-                if txn_type == 'Dividend':
-                    # Dividends tracked separately - use Gain/Loss column
-                    div_amount = txn.get('gainLoss', 0)
-                    total_dividends += div_amount
-                    asset_summary[asset_class]['dividends'] += div_amount
-                else:
-                    # For realized transactions, add to realized P/L
-                    # Use Gain/Loss column directly as requested
-                    gain = txn.get('gainLoss', 0)
-                    total_realized_pl += gain
-                    asset_summary[asset_class]['realized_pl'] += gain
-                continue  # Skip adding to portfolio value
-            
-            # For active (unrealized) holdings
-            unrealized_count += 1
-            invested = txn.get('totalAmount', 0)
-            current_val = txn.get('value', 0)
-            
-            # Only add investment transactions to holdings
-            if txn_type in ['Invest', 'Trade', 'Buy', 'BUY', 'SIP', 'SIP Installment', 'Purchase']:
-                asset_summary[asset_class]['invested'] += invested
-                asset_summary[asset_class]['current_value'] += current_val
-                total_invested += invested
-                total_current_value += current_val
-                asset_summary[asset_class]['count'] += 1
-        
-        
-        print(f"Realized: {realized_count}, Unrealized: {unrealized_count}")
-        print(f"Total invested: {total_invested}, Total current value: {total_current_value}")
-        print(f"Total dividends: {total_dividends}")
-        
-        # Calculate XIRR for overall unrealized portfolio
-        unrealized_transactions = [txn for txn in transactions if str(txn.get('realised', 'FALSE')).upper() == 'FALSE' and txn.get('type', 'Invest') in ['Invest', 'Trade', 'Buy', 'BUY', 'SIP', 'SIP Installment', 'Purchase']]
-        overall_xirr = calculate_xirr(unrealized_transactions)
-        print(f"Overall Portfolio XIRR: {overall_xirr}%")
-        
-        # Calculate Realized XIRR
-        realized_transactions_for_xirr = [txn for txn in transactions if str(txn.get('realised', 'FALSE')).upper() == 'TRUE' and txn.get('type', 'Invest') in ['Invest', 'Trade', 'Buy', 'BUY', 'SIP', 'SIP Installment', 'Purchase']]
-        realized_xirr = calculate_xirr(realized_transactions_for_xirr)
-        print(f"Overall Realized XIRR: {realized_xirr}%")
-        
-        # Calculate Realized Invested Amount
-        total_realized_invested = 0
-        for txn in realized_transactions_for_xirr:
+            classes.append(txn.get('assetClass', 'Other'))
+            securities.append(txn.get('security', 'Unknown'))
+            accounts.append(txn.get('account', ''))
+            self.realised[i] = realised == 'TRUE'
+            self.open[i] = realised == 'FALSE'
+            self.is_investment[i] = txn_type in INVESTMENT_TYPES
+            self.is_dividend[i] = txn_type == 'Dividend'
+            self.is_interest[i] = txn_type == 'Interest'
+            self.is_sell[i] = txn_type in SELL_TYPES
+            self.units[i] = float(txn.get('units', 0) or 0)
+            self.invested[i] = float(txn.get('totalAmount', 0) or 0)
+            self.value[i] = float(txn.get('value', 0) or 0)
+            self.gain_loss[i] = float(txn.get('gainLoss', 0) or 0)
             # Use XIRR buy value if present, else totalAmount. Ensure positive invested amount.
             xirr_buy = txn.get('xirrBuyValue', 0)
-            amt = abs(xirr_buy) if (xirr_buy != 0 and txn.get('xirrBuyDate')) else abs(txn.get('totalAmount', 0))
-            total_realized_invested += amt
-            
-        # Calculate XIRR per asset class
-        
-        # Calculate XIRR per asset class
-        asset_xirr = {}
-        for asset_class in asset_summary.keys():
-            asset_txns = [txn for txn in unrealized_transactions if txn.get('assetClass') == asset_class]
-            xirr = calculate_xirr(asset_txns)
-            if xirr is not None:
-                asset_xirr[asset_class] = xirr
-                print(f"{asset_class} XIRR: {xirr}%")
-        
-        # Format for frontend
-        allocation = [
-            {
+            self.realized_invested[i] = abs(xirr_buy) if (xirr_buy != 0 and txn.get('xirrBuyDate')) else abs(self.invested[i])
+            self.sell_value[i] = float(txn.get('sellValue', 0) or 0)
+            if self.gain_loss[i] == 0 and (self.is_dividend[i] or self.is_interest[i]):
+                # Income is booked in Gain/Loss; rows without it only carry the SellValue
+                self.gain_loss[i] = abs(self.sell_value[i])
+            buy_date = parse_date(txn.get('buyDate') or txn.get('date'))
+            sell_date = parse_date(txn.get('sellDate'))
+            if buy_date:
+                self.buy_day[i] = buy_date.toordinal() - EPOCH_ORDINAL
+            if sell_date:
+                self.sell_day[i] = sell_date.toordinal() - EPOCH_ORDINAL
+
+        self.class_names, self.class_codes = encode_categories(classes)
+        self.security_names, self.security_codes = encode_categories(securities)
+        self.account_names, self.account_codes = encode_categories(accounts)
+
+        # Shared masks used by several views
+        self.holding_mask = ~self.realised & self.is_investment
+        self.open_investment_mask = self.open & self.is_investment
+
+        # Mark-to-market state: rows revalued from the price store and their valuation date
+        self.price_version = 0
+        self.repriced = np.zeros(n, dtype=bool)
+        self.price_days = None
+
+        self._lock = threading.Lock()
+        self._xirr = {}
+        self._views = {}
+
+    # --- helpers ---
+
+    def _sum_by(self, codes, weights, mask, size):
+        """Grouped sum of weights over masked rows"""
+        return np.bincount(codes[mask], weights=weights[mask], minlength=size)
+
+    @property
+    def data_version(self):
+        """Version of everything the views depend on: the ledger and the applied prices"""
+        return (self.version, self.price_version)
+
+    def revalue(self, store):
+        """Copy of this snapshot with open lots marked to market from a PriceStore.
+
+        Only the value column changes (units x latest price for every open
+        investment lot whose security has a price), so the ledger is not
+        re-read or re-encoded; derived views are rebuilt lazily on the copy.
+        """
+        prices, price_days = store.price_arrays(self.security_names)
+        row_prices = prices[self.security_codes]
+        repriced = self.holding_mask & ~np.isnan(row_prices)
+
+        snapshot = copy.copy(self)
+        snapshot.value = np.where(repriced, self.units * row_prices, self.value)
+        snapshot.repriced = repriced
+        snapshot.price_days = price_days
+        snapshot.price_version = store.version
+        snapshot._lock = threading.Lock()
+        snapshot._xirr = {}
+        snapshot._views = {}
+        return snapshot
+
+    def _transaction(self, i):
+        """Ledger row as used for XIRR, with the revalued current value applied"""
+        txn = self.transactions[i]
+        if not self.repriced[i]:
+            return txn
+        day = self.price_days[self.security_codes[i]]
+        valuation = {'value': self.value[i], 'xirrSellValue': self.value[i]}
+        if not np.isnan(day):
+            valuation['xirrSellDate'] = datetime.fromordinal(int(day) + EPOCH_ORDINAL).strftime('%Y-%m-%d')
+        return {**txn, **valuation}
+
+    def xirr(self, key, rows):
+        """XIRR for a group of ledger rows, memoized per snapshot"""
+        with self._lock:
+            if key in self._xirr:
+                return self._xirr[key]
+        with timed('xirr'):
+            result = calculate_xirr([self._transaction(i) for i in rows])
+        with self._lock:
+            self._xirr[key] = result
+        return result
+
+    def solve_xirrs(self, groups):
+        """Solve the XIRRs of several (key, rows) groups in one batch and memoize them"""
+        with self._lock:
+            pending = [(key, rows) for key, rows in groups if key not in self._xirr and len(rows)]
+        if not pending:
+            return
+        with timed('xirr'):
+            results = calculate_xirr_batch([[self._transaction(i) for i in rows] for _, rows in pending])
+        with self._lock:
+            for (key, _), result in zip(pending, results):
+                self._xirr[key] = result
+
+    def _memo(self, key, builder):
+        """Memoize a derived view for the lifetime of this snapshot
+
+        Concurrent callers of a view that is still being built wait for that build
+        instead of repeating it.
+        """
+        with self._lock:
+            pending = self._views.get(key)
+            if key not in self._views:
+                building = self._views[key] = Future()
+            elif not isinstance(pending, Future):
+                return pending
+        if isinstance(pending, Future):
+            with timed('aggregate'):
+                return pending.result()
+        try:
+            with timed('aggregate'):
+                view = builder()
+        except BaseException as e:
+            with self._lock:
+                self._views.pop(key, None)
+            building.set_exception(e)
+            raise
+        with self._lock:
+            self._views[key] = view
+        building.set_result(view)
+        return view
+
+    def _filter_mask(self, base, asset_class=None, account=None):
+        mask = base
+        if asset_class:
+            mask = mask & (self.class_codes == self._code(self.class_names, asset_class))
+        if account:
+            mask = mask & (self.account_codes == self._code(self.account_names, account))
+        return mask
+
+    @staticmethod
+    def _code(names, name):
+        try:
+            return names.index(name)
+        except ValueError:
+            return -1
+
+    # --- views ---
+
+    def overview(self):
+        """Portfolio totals, allocation and XIRRs (the /portfolio/overview payload)"""
+        return self._memo('overview', self._build_overview)
+
+    def _build_overview(self):
+        n_classes = len(self.class_names)
+        codes = self.class_codes
+        holding = self.holding_mask
+        realized_gain = self.realised & ~self.is_dividend
+        dividends = self.realised & self.is_dividend
+
+        class_invested = self._sum_by(codes, self.invested, holding, n_classes)
+        class_value = self._sum_by(codes, self.value, holding, n_classes)
+        class_realized = self._sum_by(codes, self.gain_loss, realized_gain, n_classes)
+        class_dividends = self._sum_by(codes, self.gain_loss, dividends, n_classes)
+
+        total_invested = float(class_invested.sum())
+        total_current_value = float(class_value.sum())
+        total_realized_pl = float(class_realized.sum())
+        total_dividends = float(class_dividends.sum())
+
+        logger.debug("Realized: %d, Unrealized: %d, Total invested: %s, Total current value: %s",
+                     int(self.realised.sum()), int((~self.realised).sum()), total_invested, total_current_value)
+
+        open_rows = np.flatnonzero(self.open_investment_mask)
+        realized_rows = np.flatnonzero(self.realised & self.is_investment)
+        class_rows = group_indices(codes, self.open_investment_mask)
+        self.solve_xirrs([(('portfolio', 'unrealized'), open_rows), (('portfolio', 'realized'), realized_rows)] +
+                         [(('class', code), rows) for code, rows in class_rows.items() if class_value[code] > 0])
+        overall_xirr = self.xirr(('portfolio', 'unrealized'), open_rows)
+        realized_xirr = self.xirr(('portfolio', 'realized'), realized_rows)
+        total_realized_invested = float(self.realized_invested[realized_rows].sum())
+
+        allocation = []
+        for code, asset_class in enumerate(self.class_names):
+            current_value = float(class_value[code])
+            if current_value <= 0:
+                continue  # Only show asset classes with current holdings
+            rows = class_rows.get(code, np.empty(0, dtype=np.int64))
+            allocation.append({
                 'name': asset_class,
-                'value': data['current_value'],
-                'invested': data['invested'],
-                'percentage': (data['current_value'] / total_current_value * 100) if total_current_value > 0 else 0,
-                'xirr': asset_xirr.get(asset_class),
-                'realizedPL': data['realized_pl'],
-                'dividends': data['dividends']
-            }
-            for asset_class, data in asset_summary.items()
-            if data['current_value'] > 0  # Only show asset classes with current holdings
-        ]
-        
-        unrealized_pl = total_current_value - total_invested
-        
-        portfolio_data = {
+                'value': current_value,
+                'invested': float(class_invested[code]),
+                'percentage': (current_value / total_current_value * 100) if total_current_value > 0 else 0,
+                'xirr': self.xirr(('class', code), rows),
+                'realizedPL': float(class_realized[code]),
+                'dividends': float(class_dividends[code])
+            })
+
+        return {
             'totalValue': total_current_value,
             'totalInvested': total_invested,
-            'unrealizedPL': unrealized_pl,
+            'unrealizedPL': total_current_value - total_invested,
             'realizedPL': total_realized_pl,
             'dividends': total_dividends,  # Separate dividend tracking
             'xirr': overall_xirr,  # Overall portfolio XIRR
@@ -1054,26 +1984,2097 @@ def get_portfolio_overview():
             'allocation': allocation,
             'assetBreakdown': allocation  # Dashboard expects this property
         }
-        
-        return jsonify(portfolio_data)
-    
-    return jsonify(MOCK_PORTFOLIO_DATA)
 
-@app.route('/api/v1/portfolio/assets/<asset_class>', methods=['GET'])
-def get_asset_detail(asset_class):
-    """Get detailed view of specific asset class"""
-    asset_class = asset_class.lower().replace('-', '_')
-    if gs_client:
-        # TODO: Implement Google Sheets fetching
-        pass
-    assets = MOCK_ASSETS.get(asset_class, [])
-    return jsonify(assets)
+    def holdings(self, view_type='unrealized', asset_class=None, account=None):
+        """Per-security holdings (the /portfolio/holdings payload)"""
+        key = ('holdings', view_type, asset_class, account)
+        if view_type == 'realized':
+            return self._memo(key, lambda: self._build_realized_holdings(asset_class, account))
+        return self._memo(key, lambda: self._build_unrealized_holdings(asset_class, account))
 
-@app.route('/api/v1/portfolio/performance', methods=['GET'])
-def get_portfolio_performance():
-    """Get historical portfolio performance data"""
-    # Mock historical data
-    performance_data = [
+    def _build_unrealized_holdings(self, asset_class, account):
+        mask = self._filter_mask(self.open_investment_mask, asset_class, account)
+        groups = self._groups_in_order(mask)
+        self.solve_xirrs([(('security', code, asset_class, account), rows) for code, rows in groups.items()])
+        result = []
+        for code, rows in groups.items():
+            invested = float(self.invested[rows].sum())
+            current_value = float(self.value[rows].sum())
+            unrealized_pl = current_value - invested
+            unrealized_pl_pct = (unrealized_pl / invested * 100) if invested > 0 else 0
+            result.append({
+                'security': self.security_names[code],
+                'assetClass': self.class_names[self.class_codes[rows[0]]],
+                'units': float(self.units[rows].sum()),
+                'invested': round(invested, 2),
+                'currentValue': round(current_value, 2),
+                'unrealizedPL': round(unrealized_pl, 2),
+                'unrealizedPLPercent': round(unrealized_pl_pct, 2),
+                'xirr': self.xirr(('security', code, asset_class, account), rows)
+            })
+        # Sort by value descending
+        result.sort(key=lambda x: x['currentValue'], reverse=True)
+        return result
+
+    def _build_realized_holdings(self, asset_class, account):
+        mask = self._filter_mask(self.realised, asset_class, account)
+        result = []
+        for code, rows in self._groups_in_order(mask).items():
+            dividend_rows = self.is_dividend[rows]
+            result.append({
+                'security': self.security_names[code],
+                'assetClass': self.class_names[self.class_codes[rows[0]]],
+                'units': float(self.units[rows][~dividend_rows].sum()), # Sold units
+                'invested': 0,
+                'currentValue': 0,
+                'realizedPL': round(float(self.gain_loss[rows][~dividend_rows].sum()), 2),
+                'dividends': round(float(self.gain_loss[rows][dividend_rows].sum()), 2),
+                'unrealizedPL': 0,
+                'unrealizedPLPercent': 0,
+                'xirr': None
+            })
+        # Sort by realized PL + dividends descending
+        result.sort(key=lambda x: (x['realizedPL'] + x['dividends']), reverse=True)
+        return result
+
+    def _groups_in_order(self, mask):
+        """Group masked rows by security, ordered by first appearance in the filtered ledger"""
+        groups = group_indices(self.security_codes, mask)
+        return dict(sorted(groups.items(), key=lambda item: item[1][0]))
+
+    def ledger_history(self, freq='daily'):
+        """Invested amount, approximate value and cumulative dividends rebuilt from the ledger alone.
+
+        Returns (dates, value, invested, dividends) arrays on a daily or
+        month-end grid. Every lot contributes its cost from buy date until it
+        is sold, and a value that moves linearly from its buy value to its
+        sell value (realised) or current value (open) - i.e. prices are
+        interpolated between BuyRate and the known CurrentRate/SellRate.
+        Each lot's value is A + B * day on [start, end), so the whole ledger
+        reduces to cumulative sums of (A, B) over sorted event days that are
+        looked up for every grid day with searchsorted.
+        """
+        return self._memo(('ledger_history', freq), lambda: self._build_ledger_history(freq))
+
+    def _build_ledger_history(self, freq):
+        today = float(datetime.now().toordinal() - EPOCH_ORDINAL)
+        lots = self.is_investment & ~np.isnan(self.buy_day)
+        if not lots.any():
+            return np.array([], dtype='datetime64[D]'), np.array([]), np.array([]), np.array([])
+
+        start = self.buy_day[lots]
+        sold = self.realised[lots] & ~np.isnan(self.sell_day[lots])
+        end = np.where(sold, self.sell_day[lots], today)
+        end = np.maximum(end, start)
+        begin_value = self.invested[lots]
+        end_value = np.where(sold, np.where(self.sell_value[lots] != 0, self.sell_value[lots], self.value[lots]), self.value[lots])
+
+        # Linear value path per lot: value(day) = a + b * day while the lot is held
+        span = end - start
+        b = np.divide(end_value - begin_value, span, out=np.zeros_like(span), where=span > 0)
+        a = begin_value - b * start
+        # Open lots stay in the grid up to today, so their "end" event is after the last grid day
+        stop = np.where(sold, end, today + 1)
+
+        event_days = np.concatenate([start, stop])
+        order = np.argsort(event_days, kind='stable')
+        event_days = event_days[order]
+        cum_a = np.cumsum(np.concatenate([a, -a])[order])
+        cum_b = np.cumsum(np.concatenate([b, -b])[order])
+        cum_cost = np.cumsum(np.concatenate([begin_value, -begin_value])[order])
+
+        dividend_rows = self.realised & self.is_dividend
+        dividend_days = np.where(np.isnan(self.sell_day), self.buy_day, self.sell_day)[dividend_rows]
+        dividend_amounts = self.gain_loss[dividend_rows][~np.isnan(dividend_days)]
+        dividend_days = dividend_days[~np.isnan(dividend_days)]
+        dividend_order = np.argsort(dividend_days, kind='stable')
+        dividend_days = dividend_days[dividend_order]
+        cum_dividends = np.cumsum(dividend_amounts[dividend_order])
+
+        first = np.datetime64(int(start.min()), 'D')
+        last = np.datetime64(int(today), 'D')
+        if freq == 'monthly':
+            months = np.arange(first.astype('datetime64[M]'), last.astype('datetime64[M]') + 1)
+            grid = np.minimum((months + 1).astype('datetime64[D]') - 1, last)
+        else:
+            grid = np.arange(first, last + 1)
+        days = grid.astype(np.int64).astype(np.float64)
+
+        def at(cumulative, event_times):
+            idx = np.searchsorted(event_times, days, side='right') - 1
+            return np.where(idx >= 0, cumulative[np.maximum(idx, 0)] if len(cumulative) else 0.0, 0.0)
+
+        value = at(cum_a, event_days) + at(cum_b, event_days) * days
+        invested = at(cum_cost, event_days)
+        dividends = at(cum_dividends, dividend_days)
+        return grid, value, invested, dividends
+
+    def security_pl(self):
+        """Invested amount and unrealized P/L per security code (open investment lots)"""
+        return self._memo('security_pl', self._build_security_pl)
+
+    def _build_security_pl(self):
+        size = len(self.security_names)
+        mask = self.open_investment_mask
+        invested = self._sum_by(self.security_codes, self.invested, mask, size)
+        value = self._sum_by(self.security_codes, self.value, mask, size)
+        held = np.bincount(self.security_codes[mask], minlength=size) > 0
+        return invested, value - invested, held
+
+    def class_partitions(self):
+        """Per-asset-class security breakdowns, keyed by the URL form of the class name.
+
+        Built once per snapshot; each entry holds the class name and one row per
+        security with its aggregates and the ledger rows behind its open lots.
+        """
+        return self._memo('class_partitions', self._build_class_partitions)
+
+    def _build_class_partitions(self):
+        # Group by (class, security) pair in one pass
+        n_securities = len(self.security_names)
+        pair_codes = self.class_codes * n_securities + self.security_codes
+        open_rows = group_indices(pair_codes, self.open_investment_mask)
+        realized_rows = group_indices(pair_codes, self.realised)
+
+        partitions = {}
+        for pair in sorted(set(open_rows) | set(realized_rows)):
+            class_code, security_code = divmod(pair, n_securities)
+            class_name = self.class_names[class_code]
+            rows = open_rows.get(pair, np.empty(0, dtype=np.int64))
+            closed = realized_rows.get(pair, np.empty(0, dtype=np.int64))
+            dividend = self.is_dividend[closed]
+            invested = float(self.invested[rows].sum())
+            value = float(self.value[rows].sum())
+            unrealized = value - invested
+            realized = float(self.gain_loss[closed][~dividend].sum())
+            partition = partitions.setdefault(url_key(class_name), {'name': class_name, 'assets': []})
+            partition['assets'].append({
+                'id': url_key(self.security_names[security_code]),
+                'name': self.security_names[security_code],
+                'units': float(self.units[rows].sum()),
+                'value': round(value, 2),
+                'invested': round(invested, 2),
+                'profit': round(unrealized + realized, 2),
+                'realizedProfit': round(realized, 2),
+                'unrealizedProfit': round(unrealized, 2),
+                'dividends': round(float(self.gain_loss[closed][dividend].sum()), 2),
+                'profitPercent': round(unrealized / invested * 100, 2) if invested > 0 else 0,
+                '_rows': rows,
+                '_key': ('class_security', int(class_code), int(security_code))
+            })
+        return partitions
+
+    def asset_xirr(self, asset):
+        """XIRR of one class_partitions() asset row (solved lazily, memoized)"""
+        return self.xirr(asset['_key'], asset['_rows'])
+
+    def account_partitions(self):
+        """Per-account holdings partitions, so a goal's breakdown is a dict lookup.
+
+        Each account maps to its active (unrealised) ledger rows grouped by
+        asset class and security, plus monthly contribution totals.
+        """
+        return self._memo('account_partitions', self._build_account_partitions)
+
+    def _build_account_partitions(self):
+        active = ~self.realised
+        contributions = self.is_investment & ~np.isnan(self.buy_day)
+
+        partitions = {}
+        for account_code, rows in group_indices(self.account_codes, active).items():
+            classes = group_indices(self.class_codes[rows])
+            partition = {'value': float(self.value[rows].sum()), 'invested': float(self.invested[rows].sum()), 'classes': []}
+            for class_index, class_rows in classes.items():
+                class_rows = rows[class_rows]
+                securities = group_indices(self.security_codes[class_rows])
+                partition['classes'].append({
+                    'code': class_index,
+                    'rows': class_rows,
+                    'securities': [(code, class_rows[idx]) for code, idx in securities.items()]
+                })
+            partitions[self.account_names[account_code]] = partition
+
+        # Contribution timeline: invested amount per (account, month), including lots sold since
+        for account_code, rows in group_indices(self.account_codes, contributions).items():
+            account_months = self.buy_day[rows].astype(np.int64).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+            first = account_months.min()
+            totals = np.bincount(account_months - first, weights=self.invested[rows])
+            filled = np.flatnonzero(totals)
+            partition = partitions.setdefault(self.account_names[account_code], {'value': 0.0, 'invested': 0.0, 'classes': []})
+            partition['timeline'] = (filled + first, totals[filled])
+        return partitions
+
+    def goal_breakdown(self, account):
+        """Allocation of an account by asset class and security, with XIRRs and contribution timeline"""
+        partition = self.account_partitions().get(account)
+        if partition is None:
+            return [], []
+        total_value = partition['value']
+
+        def share(value):
+            return round(value / total_value * 100, 2) if total_value > 0 else 0
+
+        self.solve_xirrs(
+            [(('account_class', account, int(entry['code'])), entry['rows']) for entry in partition['classes']] +
+            [(('account_security', account, int(code)), rows) for entry in partition['classes'] for code, rows in entry['securities']])
+        allocations = []
+        for entry in partition['classes']:
+            class_name = self.class_names[entry['code']]
+            class_value = float(self.value[entry['rows']].sum())
+            securities = []
+            for security_code, rows in entry['securities']:
+                value = float(self.value[rows].sum())
+                securities.append({
+                    'id': url_key(self.security_names[security_code]),
+                    'name': self.security_names[security_code],
+                    'units': float(self.units[rows].sum()),
+                    'value': round(value, 2),
+                    'invested': round(float(self.invested[rows].sum()), 2),
+                    'allocation': share(value),
+                    'xirr': self.xirr(('account_security', account, int(security_code)), rows)
+                })
+            securities.sort(key=lambda x: x['value'], reverse=True)
+            allocations.append({
+                'id': url_key(class_name),
+                'name': class_name,
+                'value': round(class_value, 2),
+                'invested': round(float(self.invested[entry['rows']].sum()), 2),
+                'allocation': share(class_value),
+                'xirr': self.xirr(('account_class', account, int(entry['code'])), entry['rows']),
+                'securities': securities
+            })
+        allocations.sort(key=lambda x: x['value'], reverse=True)
+
+        timeline = []
+        if 'timeline' in partition:
+            month_codes, amounts = partition['timeline']
+            labels = np.datetime_as_string(month_codes.astype('datetime64[M]'))
+            for label, amount, cumulative in zip(labels, amounts, np.cumsum(amounts)):
+                timeline.append({'month': str(label), 'contributed': round(float(amount), 2), 'cumulative': round(float(cumulative), 2)})
+        return allocations, timeline
+
+    def account_summary(self):
+        """Unrealized value and XIRR per account (goals are matched to accounts by name)"""
+        return self._memo('accounts', self._build_account_summary)
+
+    def _build_account_summary(self):
+        active = ~self.realised
+        values = self._sum_by(self.account_codes, self.value, active, len(self.account_names))
+        groups = group_indices(self.account_codes, active)
+        self.solve_xirrs([(('account', code), rows) for code, rows in groups.items()])
+        summary = {}
+        for code, rows in groups.items():
+            summary[self.account_names[code]] = {
+                'value': float(values[code]),
+                'xirr': self.xirr(('account', code), rows)
+            }
+        return summary
+
+    def goal_progress(self, goals):
+        """Goals with value, progress and XIRR filled in from their matching account"""
+        accounts = self.account_summary()
+        result = []
+        for goal in goals:
+            account = accounts.get(goal.get('name', ''), {})
+            current_value = account.get('value', 0)
+            target_amount = goal.get('targetAmount', 0)
+            result.append({
+                **goal,
+                'value': current_value,
+                'progress': min((current_value / target_amount * 100), 100) if target_amount > 0 else 0,
+                'xirr': account.get('xirr')
+            })
+        return result
+
+class PriceStore:
+    """Latest known price per security, used to revalue open holdings without re-reading the ledger.
+
+    Loaded from the 'Prices' worksheet (Security, Price, Date) and/or
+    uploaded as CSV/JSON. Every change bumps the version, which is what
+    invalidates revalued snapshots. With a shared store the table and its
+    version live there, so one worker's load or upload serves all of them.
+    """
+
+    def __init__(self, shared=None):
+        self.prices = {}  # security -> {'price', 'date', 'source'}
+        self.version = 0
+        self.loaded = False
+        self.shared = shared
+        self._lock = threading.Lock()
+
+    def _adopt(self):
+        version, _, blob = self.shared.get('prices')
+        if version != self.version:
+            if blob is not None:
+                self.prices = pickle.loads(blob)
+                self.loaded = True
+            self.version = version
+
+    def sync(self):
+        """Adopt prices loaded or uploaded by other worker processes"""
+        if self.shared is None:
+            return
+        try:
+            if self.shared.stamp('prices')[0] != self.version:
+                with self._lock:
+                    self._adopt()
+        except Exception as e:
+            logger.warning(f"⚠ Shared price store read failed: {e}")
+
+    def _store(self, prices):
+        """Replace the table, bumping the version (None if another worker changed it first)"""
+        if self.shared is not None:
+            try:
+                version = self.shared.put('prices', pickle.dumps(prices), time.time(), if_version=self.version)
+                if version is None:
+                    return None
+                self.prices, self.version = prices, version
+                return version
+            except Exception as e:
+                logger.warning(f"⚠ Shared price store write failed: {e}")
+        self.prices, self.version = prices, self.version + 1
+        return self.version
+
+    def update(self, records, source):
+        """Merge price records ({security, price, date}); returns (updated count, errors)"""
+        parsed_prices, errors = {}, []
+        for record in records:
+            security = str(record.get('security', record.get('Security', ''))).strip()
+            price = record.get('price', record.get('Price'))
+            date = record.get('date', record.get('Date', ''))
+            try:
+                price = float(str(price).replace('₹', '').replace(',', '').strip())
+            except (TypeError, ValueError):
+                errors.append(f"Invalid price for '{security}': {price}")
+                continue
+            if not security:
+                errors.append("Missing security name")
+                continue
+            parsed = parse_date(date)
+            parsed_prices[security] = {
+                'price': price,
+                'date': parsed.strftime('%Y-%m-%d') if parsed else None,
+                'source': source
+            }
+        with self._lock:
+            if parsed_prices or (self.shared is not None and source == 'sheet'):
+                # Merge into the latest shared table; retry if another worker wrote in between
+                while True:
+                    if self.shared is not None:
+                        self._adopt()
+                    if self._store({**self.prices, **parsed_prices}) is not None:
+                        break
+        return len(parsed_prices), errors
+
+    def load_from_sheet(self):
+        """(Re)load prices from the 'Prices' worksheet if it exists"""
+        self.loaded = True
+        if not gs_client:
+            return 0
+        try:
+            sheet_name = os.getenv('SHEET_NAME', 'WealthManagement')
+            worksheet = open_workbook(sheet_name).worksheet('Prices')
+            updated, errors = self.update(worksheet.get_all_records(), 'sheet')
+            for error in errors:
+                logger.warning("Error parsing price record: %s", error, extra={'event': 'parse.error'})
+            logger.info(f"✓ Loaded {updated} prices from Prices worksheet")
+            return updated
+        except Exception as e:
+            logger.warning(f"⚠ Prices worksheet not loaded: {e}")
+            return 0
+
+    def ensure_loaded(self):
+        self.sync()
+        if not self.loaded:
+            self.load_from_sheet()
+
+    def price_arrays(self, securities):
+        """Price and price day (days since epoch) per security, NaN where unknown"""
+        with self._lock:
+            prices = np.full(len(securities), np.nan)
+            days = np.full(len(securities), np.nan)
+            for code, security in enumerate(securities):
+                entry = self.prices.get(security)
+                if entry is not None:
+                    prices[code] = entry['price']
+                    parsed = parse_date(entry['date'])
+                    if parsed:
+                        days[code] = parsed.toordinal() - EPOCH_ORDINAL
+        return prices, days
+
+price_store = PriceStore(shared=shared_cache)
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+_revalued = None
+
+def get_portfolio_snapshot():
+    """Get the snapshot for the current transactions data version, building it if needed
+
+    When the price store has prices, the snapshot is the marked-to-market
+    copy for the current price version.
+    """
+    global _snapshot, _revalued
+    if not gs_client:
+        # Mock data is tiny and mutated in place, so never cache it
+        return PortfolioSnapshot(MOCK_TRANSACTIONS)
+
+    transactions = read_transactions_from_sheets()
+    version = cache_manager.version('transactions')
+    price_store.ensure_loaded()
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.version != version or _snapshot.transactions is not transactions:
+            with timed('aggregate'):
+                _snapshot = PortfolioSnapshot(transactions, version)
+            logger.info(f"✓ Built portfolio snapshot v{version} ({len(transactions)} transactions)")
+            data_events.publish('snapshot')
+        if not price_store.prices:
+            return _snapshot
+        if _revalued is None or _revalued.data_version != (version, price_store.version) or _revalued.transactions is not transactions:
+            with timed('aggregate'):
+                _revalued = _snapshot.revalue(price_store)
+        return _revalued
+
+# ============================================================
+# Transaction Change Log
+# ============================================================
+
+# Ledger versions kept for delta sync; older clients get a full resync
+TRANSACTION_CHANGE_LOG_SIZE = int(os.environ.get('TRANSACTION_CHANGE_LOG_SIZE', 500))
+
+def index_transactions(transactions):
+    """{id: row} for rows with a unique id, plus the rows that cannot be tracked by id
+
+    Rows are copied, so later in-place edits of the cached ledger still show up as changes.
+    """
+    counts = {}
+    for txn in transactions:
+        counts[txn.get('id')] = counts.get(txn.get('id'), 0) + 1
+    index, untracked = {}, []
+    for txn in transactions:
+        if txn.get('id') and counts[txn['id']] == 1:
+            index[txn['id']] = dict(txn)
+        else:
+            untracked.append(dict(txn))
+    return index, untracked
+
+class TransactionChangeLog:
+    """Ids inserted, updated or deleted between ledger versions.
+
+    Each newly observed ledger is diffed by id against the previous one.
+    Versions are the cache's data versions, which are shared across workers
+    when SHARED_CACHE_PATH is set. A ledger too large to cache has no
+    version of its own, so one is allocated from the cache when its content
+    changed. A worker that skipped versions records one wider entry, which
+    is still a correct (superset) answer for any client in between. Entries
+    are evicted oldest first; a client older than the floor has to resync.
+    """
+
+    def __init__(self, size=TRANSACTION_CHANGE_LOG_SIZE):
+        self._lock = threading.Lock()
+        self.entries = deque(maxlen=size)  # (version, changed ids, untracked rows changed)
+        self.floor = None  # oldest version the entries reach back to
+        self.version = None
+        self.ledger = None  # last observed ledger, served when an uncached ledger cannot be re-read
+        self.index = {}
+        self.untracked = []
+
+    def observe(self, transactions, version=None):
+        """Record a ledger read from the sheet and return its version
+
+        version is the cache version of the ledger, or None when the ledger
+        is not cached (e.g. larger than the cache's size limit).
+        """
+        with self._lock:
+            if self.version is not None and (version == self.version or transactions is self.ledger):
+                return self.version
+            index, untracked = index_transactions(transactions)
+            if self.version is None or (version is not None and version < self.version):
+                # First ledger, or the version counter was reset: start a new log
+                self.entries.clear()
+                self.floor = self.version = cache_manager.version('transactions') if version is None else version
+            else:
+                changed = {txn_id for txn_id, txn in index.items() if self.index.get(txn_id) != txn}
+                changed.update(self.index.keys() - index.keys())
+                untracked_changed = untracked != self.untracked
+                if version is None:
+                    if not changed and not untracked_changed:
+                        self.ledger = transactions
+                        return self.version
+                    version = cache_manager.bump_version('transactions')
+                if len(self.entries) == self.entries.maxlen:
+                    self.floor = self.entries[0][0]
+                self.entries.append((version, changed, untracked_changed))
+                self.version = version
+            self.ledger, self.index, self.untracked = transactions, index, untracked
+            return self.version
+
+    def changes_since(self, since):
+        """(upserted rows, deleted ids) after version since, or None when the client has to resync"""
+        with self._lock:
+            if self.version is None or since is None or since < self.floor or since > self.version:
+                return None
+            changed = set()
+            for version, ids, untracked in self.entries:
+                if version > since:
+                    if untracked:
+                        return None
+                    changed |= ids
+            if len(changed) > len(self.index) // 2:
+                return None  # cheaper to send everything
+            upserted = [self.index[txn_id] for txn_id in sorted(changed) if txn_id in self.index]
+            return upserted, sorted(changed - self.index.keys())
+
+    def get_stats(self):
+        return {"version": self.version, "floor": self.floor, "entries": len(self.entries)}
+
+transaction_changes = TransactionChangeLog()
+
+def current_ledger():
+    """The ledger and its data version, observed into the change log"""
+    transactions = read_transactions_from_sheets()
+    version = cache_manager.version('transactions')
+    # The cache version only describes these rows if they are still the cached ones;
+    # otherwise (not cacheable, or replaced meanwhile) the change log diffs the content
+    if cache_manager.get_stale('transactions') is not transactions:
+        version = None
+    return transactions, transaction_changes.observe(transactions, version)
+
+# ============================================================
+# Historical Series
+# ============================================================
+
+HISTORY_SHEETS = ['Historical', 'Historical-Other']
+
+# Column used as the portfolio value in performance charts (auto-detected when not set)
+HISTORY_VALUE_COLUMN = os.environ.get('HISTORY_VALUE_COLUMN')
+HISTORY_INVESTED_COLUMN = os.environ.get('HISTORY_INVESTED_COLUMN')
+
+DEFAULT_PERFORMANCE_POINTS = 365
+
+# Below this many rows the Historical sheet is treated as missing and the series is rebuilt from the ledger
+HISTORY_MIN_POINTS = int(os.environ.get('HISTORY_MIN_POINTS', 30))
+
+# Force a full re-read of the history sheets at least this often (edits to old rows)
+HISTORY_FULL_RELOAD_SECONDS = int(os.environ.get('HISTORY_FULL_RELOAD_SECONDS', 6 * 3600))
+
+def parse_numeric_strings(values):
+    """Vectorized currency parse of a string array: strip ₹ and commas, blanks and junk become 0.0"""
+    cleaned = np.char.strip(np.char.replace(np.char.replace(values, '₹', ''), ',', ''))
+    cleaned = np.where(cleaned == '', '0', cleaned)
+    try:
+        return cleaned.astype(np.float64)
+    except ValueError:
+        # Some cells are not numbers (#N/A, text) - fall back to a per-cell parse for this column
+        parsed = np.zeros(len(cleaned))
+        for i, value in enumerate(cleaned):
+            try:
+                parsed[i] = float(value)
+            except ValueError:
+                pass
+        return parsed
+
+class HistoryFrame:
+    """One Historical worksheet held as columns: sorted dates plus one float64 array per header"""
+
+    def __init__(self, source, dates, columns, labels=None):
+        self.source = source
+        self.dates = dates  # datetime64[D], ascending
+        self.columns = columns  # header -> float64 array aligned with dates
+        self.labels = labels if labels is not None else np.datetime_as_string(dates, unit='D').astype(object)
+        # Revalidation bookkeeping, filled in by load_history_frame
+        self.headers = []
+        self.raw_row_count = 0
+        self.date_fingerprint = None
+        self.loaded_at = 0
+
+    @classmethod
+    def from_values(cls, source, headers, rows):
+        """Parse worksheet values (data rows, without the header row) into typed columns"""
+        rows = [r for r in rows if r and r[0]]
+        width = max([len(headers)] + [len(r) for r in rows])
+        names = [headers[i] if i < len(headers) else f"Column_{i}" for i in range(1, width)]
+
+        dates, kept = [], []
+        for r in rows:
+            row_date = parse_date(r[0])
+            if row_date is not None:
+                dates.append(row_date.date())
+                kept.append(r)
+
+        labels = np.array([r[0] for r in kept], dtype=object)
+        grid = np.array([r[1:] + [''] * (width - len(r)) for r in kept], dtype=str).reshape(len(kept), width - 1)
+        dates = np.array(dates, dtype='datetime64[D]')
+        order = np.argsort(dates, kind='stable')
+        columns = {name: parse_numeric_strings(grid[:, i])[order] for i, name in enumerate(names)}
+        return cls(source, dates[order], columns, labels[order])
+
+    @property
+    def nbytes(self):
+        return self.dates.nbytes + sum(column.nbytes for column in self.columns.values())
+
+    def append(self, other):
+        """New frame with other's rows added (re-sorted only if they are not already later)"""
+        dates = np.concatenate([self.dates, other.dates])
+        labels = np.concatenate([self.labels, other.labels])
+        columns = {
+            name: np.concatenate([column, other.columns.get(name, np.zeros(len(other)))])
+            for name, column in self.columns.items()
+        }
+        if len(self) and len(other) and other.dates[0] < self.dates[-1]:
+            order = np.argsort(dates, kind='stable')
+            dates, labels = dates[order], labels[order]
+            columns = {name: column[order] for name, column in columns.items()}
+        return HistoryFrame(self.source, dates, columns, labels)
+
+    def select(self, names):
+        """Frame restricted to the given columns (unknown names are ignored)"""
+        return HistoryFrame(self.source, self.dates, {n: self.columns[n] for n in names if n in self.columns}, self.labels)
+
+    def to_rows(self):
+        """Row dicts in the legacy /history format"""
+        columns = {name: column.tolist() for name, column in self.columns.items()}
+        return [
+            {'date': label, 'type': self.source, **{name: values[i] for name, values in columns.items()}}
+            for i, label in enumerate(self.labels.tolist())
+        ]
+
+    def __len__(self):
+        return len(self.dates)
+
+    def slice(self, start=None, end=None):
+        """Rows with start <= date <= end, located by binary search"""
+        lo = np.searchsorted(self.dates, np.datetime64(start, 'D'), side='left') if start else 0
+        hi = np.searchsorted(self.dates, np.datetime64(end, 'D'), side='right') if end else len(self.dates)
+        return HistoryFrame(self.source, self.dates[lo:hi], {k: v[lo:hi] for k, v in self.columns.items()}, self.labels[lo:hi])
+
+    def find_column(self, configured, keywords):
+        """Pick a column by explicit name or the first header containing one of the keywords"""
+        if configured and configured in self.columns:
+            return configured
+        for keyword in keywords:
+            for header in self.columns:
+                if keyword in header.lower():
+                    return header
+        return None
+
+    def value_column(self):
+        return self.find_column(HISTORY_VALUE_COLUMN, ['current value', 'total value', 'value', 'total']) \
+            or (list(self.columns)[-1] if self.columns else None)
+
+    def invested_column(self):
+        return self.find_column(HISTORY_INVESTED_COLUMN, ['invest'])
+
+def _fingerprint(labels):
+    # Stable across processes (unlike hash()), since frames are shared through the L2 cache
+    return hashlib.blake2b('\x1f'.join(map(str, labels)).encode('utf-8'), digest_size=16).hexdigest()
+
+def load_history_frame(workbook, title, cached=None, values=None):
+    """Load one Historical worksheet, reusing the cached frame when the sheet has only grown.
+
+    Revalidation reads just the date column: if the rows we already parsed are
+    unchanged, only the appended tail is fetched and parsed. values, when
+    given, are the sheet's already fetched cells (see batch_get_values).
+    """
+    from gspread.utils import rowcol_to_a1
+
+    if values is None and cached is not None and time.time() - cached.loaded_at < HISTORY_FULL_RELOAD_SECONDS:
+        worksheet = workbook.worksheet(title)
+        labels = worksheet.col_values(1)
+        known = cached.raw_row_count
+        if len(labels) >= known and _fingerprint(labels[:known]) == cached.date_fingerprint:
+            if len(labels) == known:
+                return cached
+            tail = worksheet.get(f"A{known + 1}:{rowcol_to_a1(len(labels), max(len(cached.headers), 1))}")
+            frame = cached.append(HistoryFrame.from_values(title, cached.headers, tail))
+            frame.headers = cached.headers
+            frame.raw_row_count = len(labels)
+            frame.date_fingerprint = _fingerprint(labels)
+            frame.loaded_at = cached.loaded_at
+            logger.info(f"✓ Appended {len(labels) - known} rows to {title} history")
+            return frame
+
+    if values is None:
+        values = workbook.worksheet(title).get_all_values()
+    if not values or len(values) < 2:
+        return None
+    labels = [r[0] if r else '' for r in values]
+    while labels and not labels[-1]:
+        labels.pop()
+    frame = HistoryFrame.from_values(title, values[0], values[1:])
+    frame.headers = values[0]
+    frame.raw_row_count = len(labels)
+    frame.date_fingerprint = _fingerprint(labels)
+    frame.loaded_at = time.time()
+    return frame
+
+def get_history_frames(force=False, strict=False):
+    """Historical sheets as {sheet title: HistoryFrame}, cached with TTL and revalidation
+
+    force skips the TTL check and revalidates now (used by the precompute scheduler).
+    strict raises instead of serving stale frames when a sheet could not be read.
+    """
+    if not gs_client:
+        return {}
+
+    cached = None if force else cache_manager.get('history')
+    if cached is not None:
+        return cached
+
+    stale = cache_manager.get_stale('history') or {}
+    try:
+        workbook = open_workbook()
+    except Exception as e:
+        if strict:
+            raise
+        logger.error(f"Error reading historical data: {e}")
+        return stale
+
+    # Sheets without a revalidatable frame are fetched whole, together in one batch request
+    cold = [t for t in HISTORY_SHEETS
+            if t not in stale or time.time() - stale[t].loaded_at >= HISTORY_FULL_RELOAD_SECONDS]
+    prefetched = {}
+    if len(cold) > 1:
+        try:
+            prefetched = batch_get_values(workbook, cold)
+        except Exception as e:
+            logger.warning(f"Warning: Batch read of {', '.join(cold)} failed, reading sheets individually: {e}")
+
+    def loader(title):
+        def load():
+            from gspread.exceptions import WorksheetNotFound
+            try:
+                with timed('parse'):
+                    frame = load_history_frame(workbook, title, stale.get(title), prefetched.get(title))
+            except WorksheetNotFound:
+                frame = None
+            # Wrapped so an empty or missing sheet is told apart from a failed read (None)
+            return (frame,)
+        return load
+
+    loaded = fetch_parallel({title: loader(title) for title in HISTORY_SHEETS})
+    failed = [title for title in HISTORY_SHEETS if loaded[title] is None]
+    frames = {}
+    for title in HISTORY_SHEETS:
+        frame = stale.get(title) if title in failed else loaded[title][0]
+        if frame is not None and len(frame):
+            frames[title] = frame
+
+    if failed and strict:
+        raise RuntimeError(f"History fetch failed: {', '.join(failed)}")
+    if failed:
+        # Serve what we have, but leave the cache stale so the next request retries
+        logger.warning(f"⚠ History not refreshed, failed to read {', '.join(failed)}")
+        return frames
+    if stale and frames.keys() == stale.keys() and all(frames[t] is stale[t] for t in frames):
+        cache_manager.touch('history')  # Revalidated, nothing changed
+        return stale
+    cache_manager.set('history', frames)
+    return frames
+
+SHEET_READERS = {
+    'transactions': lambda: read_transactions_from_sheets(),
+    'goals': lambda: read_goals_from_sheets(),
+    'history': lambda: get_history_frames()
+}
+
+def prefetch(*keys):
+    """Warm the caches for the given sheets concurrently before a handler reads them one by one"""
+    if not gs_client:
+        return
+    cold = {key: SHEET_READERS[key] for key in keys if not cache_manager.is_fresh(key)}
+    if len(cold) > 1:
+        fetch_parallel(cold)
+
+def downsample_lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling, returns the indices of the points to keep.
+
+    Keeps the first and last points and, per bucket, the point forming the
+    largest triangle with the previous pick and the next bucket's average,
+    so peaks and troughs survive while flat stretches are thinned out.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket boundaries for the n - 2 interior points
+    edges = (np.floor(np.arange(threshold - 1) * (n - 2) / (threshold - 2)) + 1).astype(np.int64)
+    edges[-1] = n - 1
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+def format_performance_series(dates, values, invested=None, points=DEFAULT_PERFORMANCE_POINTS, dividends=None):
+    """Downsample aligned date/value arrays and format them as performance points"""
+    valid = ~np.isnan(values)
+    dates, values = dates[valid], values[valid]
+    keep = downsample_lttb(dates.astype(np.int64).astype(np.float64), values, points)
+    dates, values = dates[keep], values[keep]
+    if invested is not None:
+        invested = invested[valid][keep]
+    if dividends is not None:
+        dividends = dividends[valid][keep]
+    # Profit is the change since the previous charted point
+    profit = np.diff(values, prepend=values[:1])
+
+    series = []
+    for i, day in enumerate(np.datetime_as_string(dates, unit='D')):
+        point = {'date': str(day), 'value': round(float(values[i]), 2), 'profit': round(float(profit[i]), 2)}
+        if invested is not None:
+            point['invested'] = round(float(invested[i]), 2)
+        if dividends is not None:
+            point['dividends'] = round(float(dividends[i]), 2)
+        series.append(point)
+    return series
+
+def history_performance_series(frame, start=None, end=None, points=DEFAULT_PERFORMANCE_POINTS):
+    """Performance points (date, value, profit, invested) from a Historical frame"""
+    value_column = frame.value_column()
+    if value_column is None:
+        return []
+    frame = frame.slice(start, end)
+    invested_column = frame.invested_column()
+    invested = frame.columns[invested_column] if invested_column else None
+    return format_performance_series(frame.dates, frame.columns[value_column], invested, points)
+
+def ledger_performance_series(snapshot, start=None, end=None, points=DEFAULT_PERFORMANCE_POINTS, freq='daily'):
+    """Performance points reconstructed from the transaction ledger"""
+    dates, value, invested, dividends = snapshot.ledger_history(freq)
+    lo = np.searchsorted(dates, np.datetime64(start, 'D'), side='left') if start else 0
+    hi = np.searchsorted(dates, np.datetime64(end, 'D'), side='right') if end else len(dates)
+    return format_performance_series(dates[lo:hi], value[lo:hi], invested[lo:hi], points, dividends[lo:hi])
+
+# ============================================================
+# Goal Projections (Monte Carlo)
+# ============================================================
+
+# Fallback market assumptions when there is not enough history to calibrate from
+DEFAULT_ANNUAL_RETURN = float(os.environ.get('DEFAULT_ANNUAL_RETURN', 0.10))
+DEFAULT_ANNUAL_VOLATILITY = float(os.environ.get('DEFAULT_ANNUAL_VOLATILITY', 0.15))
+PROJECTION_PATHS = int(os.environ.get('PROJECTION_PATHS', 20000))
+PROJECTION_MAX_MONTHS = 50 * 12
+# Paths are simulated in blocks to bound memory (months x block floats per array)
+PROJECTION_BLOCK = 4096
+
+# Per asset type (annual return, annual volatility), used when there is no price history to
+# calibrate from; matched by keyword in the asset class name, first match wins
+ASSET_CLASS_ASSUMPTIONS = [
+    ('liquid', 0.065, 0.01),
+    ('equity', 0.12, 0.16), ('stock', 0.12, 0.20), ('share', 0.12, 0.20), ('etf', 0.11, 0.16),
+    ('gold', 0.08, 0.14), ('sgb', 0.08, 0.14),
+    ('debt', 0.07, 0.03), ('bond', 0.07, 0.04),
+    ('ppf', 0.071, 0.0), ('epf', 0.0825, 0.0), ('fd', 0.07, 0.0), ('deposit', 0.07, 0.0),
+]
+
+_projection_cache = {}
+_projection_lock = threading.Lock()
+
+def asset_class_assumptions(asset_class):
+    """(annual return, annual volatility) assumed for an asset class"""
+    name = str(asset_class).lower()
+    for keyword, annual_return, volatility in ASSET_CLASS_ASSUMPTIONS:
+        if keyword in name:
+            return annual_return, volatility
+    return DEFAULT_ANNUAL_RETURN, DEFAULT_ANNUAL_VOLATILITY
+
+def blended_monthly_returns(allocation):
+    """Monthly (mu, sigma) of a portfolio with this allocation, from the per-class assumptions
+
+    Volatilities are added as if the classes were perfectly correlated, which
+    errs on the cautious side.
+    """
+    weights = np.array([item['value'] for item in allocation], dtype=float)
+    weights /= weights.sum()
+    assumptions = np.array([asset_class_assumptions(item['name']) for item in allocation])
+    annual_return, volatility = weights @ assumptions
+    return float(np.log(1 + annual_return) / 12), float(volatility / np.sqrt(12))
+
+def calibrate_monthly_returns():
+    """Mean and standard deviation of monthly log returns of the portfolio value.
+
+    Uses month-end points of the Historical value series. When an invested
+    column is available, returns are adjusted for that month's net
+    contributions so SIPs are not counted as growth. Without enough history,
+    falls back to per-asset-class assumptions weighted by the current
+    allocation: the ledger reconstruction holds values at cost, so its
+    near-zero volatility would make every goal look certain or hopeless.
+    """
+    frame = get_history_frames().get('Historical') if gs_client else None
+    if frame is not None and len(frame) >= HISTORY_MIN_POINTS and frame.value_column():
+        dates = frame.dates
+        values = frame.columns[frame.value_column()]
+        invested_column = frame.invested_column()
+        invested = frame.columns[invested_column] if invested_column else None
+
+        # Last point of each month
+        months = dates.astype('datetime64[M]')
+        month_ends = np.flatnonzero(np.append(months[1:] != months[:-1], True))
+        v = values[month_ends]
+        flows = np.diff(invested[month_ends]) if invested is not None else np.zeros(len(v) - 1)
+        previous = v[:-1]
+        ok = (previous > 0) & (v[1:] - flows > 0)
+        log_returns = np.log((v[1:] - flows)[ok] / previous[ok])
+        if len(log_returns) >= 12:
+            return float(log_returns.mean()), float(log_returns.std(ddof=1)), 'historical', len(log_returns)
+
+    allocation = get_portfolio_snapshot().overview()['allocation'] if gs_client else []
+    if allocation:
+        mu, sigma = blended_monthly_returns(allocation)
+        return mu, sigma, 'asset-class', 0
+
+    sigma = DEFAULT_ANNUAL_VOLATILITY / np.sqrt(12)
+    mu = np.log(1 + DEFAULT_ANNUAL_RETURN) / 12
+    return float(mu), float(sigma), 'default', 0
+
+def simulate_growth(horizons, mu, sigma, paths, seed):
+    """Simulate monthly log-normal returns for all goals at once.
+
+    Returns (growth, annuity), each shaped (paths, goals): growth is the
+    value multiple of a lump sum held for each goal's horizon and annuity the
+    multiple of a monthly SIP (paid at the start of each month) over it.
+    Paths are drawn month-major from per-block seeded generators, so a goal's
+    result does not depend on which other goals are in the batch.
+    """
+    horizons = np.asarray(horizons, dtype=np.int64)
+    months = max(int(horizons.max()), 1)
+    columns = np.clip(horizons, 1, None) - 1
+    growth = np.empty((paths, len(horizons)))
+    annuity = np.empty((paths, len(horizons)))
+    for block, start in enumerate(range(0, paths, PROJECTION_BLOCK)):
+        size = min(PROJECTION_BLOCK, paths - start)
+        rng = np.random.default_rng([seed, block])
+        log_returns = rng.normal(mu, sigma, size=(months, size)).T
+        cumulative = np.exp(np.cumsum(log_returns, axis=1))  # G_k for k = 1..months
+        # sum_{k=0}^{h-1} 1 / G_k with G_0 = 1
+        inverse = np.cumsum(np.hstack([np.ones((size, 1)), 1.0 / cumulative[:, :-1]]), axis=1)
+        growth[start:start + size] = cumulative[:, columns]
+        annuity[start:start + size] = cumulative[:, columns] * inverse[:, columns]
+    # Goals at or past their date have no time left to grow
+    growth[:, horizons <= 0] = 1.0
+    annuity[:, horizons <= 0] = 0.0
+    return growth, annuity
+
+def months_until(target_date, today=None):
+    today = today or datetime.now()
+    target = parse_date(target_date)
+    if target is None:
+        return None
+    return (target.year - today.year) * 12 + (target.month - today.month)
+
+def project_goals(goals, paths=PROJECTION_PATHS, seed=42, sip=0.0, confidence=(0.5, 0.75, 0.9), version=None):
+    """Probability of reaching each goal's target and the SIP needed at the given confidence levels"""
+    mu, sigma, source, samples = calibrate_monthly_returns()
+    params = (paths, seed, sip, tuple(confidence), round(mu, 10), round(sigma, 10))
+
+    results, pending = {}, []
+    with _projection_lock:
+        for goal in goals:
+            key = (goal['id'], goal.get('value', 0), goal.get('targetAmount', 0), goal.get('targetDate'), version, params)
+            if key in _projection_cache:
+                results[goal['id']] = _projection_cache[key]
+            else:
+                pending.append((key, goal))
+
+    simulated = [(key, goal, months_until(goal.get('targetDate'))) for key, goal in pending]
+    simulated = [(key, goal, min(h, PROJECTION_MAX_MONTHS)) for key, goal, h in simulated if h is not None]
+    if simulated:
+        horizons = np.array([h for _, _, h in simulated])
+        growth, annuity = simulate_growth(horizons, mu, sigma, paths, seed)
+        current = np.array([float(goal.get('value', 0) or 0) for _, goal, _ in simulated])
+        target = np.array([float(goal.get('targetAmount', 0) or 0) for _, goal, _ in simulated])
+
+        terminal = current * growth + sip * annuity
+        probability = (terminal >= target).mean(axis=0)
+        # SIP each path needs to hit the target; the c-quantile succeeds on a fraction c of paths
+        shortfall = np.maximum(target - current * growth, 0)
+        needed = np.divide(shortfall, annuity, out=np.full_like(shortfall, np.inf), where=annuity > 0)
+        needed[shortfall == 0] = 0.0
+        required = np.quantile(needed, confidence, axis=0)
+        percentiles = np.percentile(terminal, [10, 50, 90], axis=0)
+
+        with _projection_lock:
+            if len(_projection_cache) > 1000:
+                _projection_cache.clear()  # Old data versions are never asked for again
+            for j, (key, goal, horizon) in enumerate(simulated):
+                result = {
+                    'goalId': goal['id'],
+                    'name': goal.get('name'),
+                    'months': int(horizon),
+                    'probability': round(float(probability[j]) * 100, 2),
+                    'requiredMonthlySip': {
+                        f"{int(round(c * 100))}%": (round(float(required[i, j]), 2) if np.isfinite(required[i, j]) else None)
+                        for i, c in enumerate(confidence)
+                    },
+                    'projectedValue': {
+                        'p10': round(float(percentiles[0, j]), 2),
+                        'p50': round(float(percentiles[1, j]), 2),
+                        'p90': round(float(percentiles[2, j]), 2)
+                    }
+                }
+                _projection_cache[key] = result
+                results[goal['id']] = result
+
+    return {
+        'assumptions': {
+            'source': source,
+            'samples': samples,
+            'expectedAnnualReturn': round((np.exp(mu * 12) - 1) * 100, 2),
+            'annualVolatility': round(sigma * np.sqrt(12) * 100, 2),
+            'paths': paths,
+            'seed': seed,
+            'monthlySip': sip
+        },
+        'projections': [results[g['id']] for g in goals if g['id'] in results]
+    }
+
+# ============================================================
+# Risk Metrics
+# ============================================================
+
+# Annual risk-free rate used for Sharpe/Sortino (e.g. a T-bill or liquid fund yield)
+RISK_FREE_RATE = float(os.environ.get('RISK_FREE_RATE', 0.065))
+CAGR_YEARS = [1, 3, 5]
+
+_risk_cache = {}
+_risk_lock = threading.Lock()
+
+def rolling_sum(values, window):
+    """Sum over each trailing window of length `window` via a cumulative sum"""
+    cumulative = np.concatenate([[0.0], np.cumsum(values)])
+    return cumulative[window:] - cumulative[:-window]
+
+def max_drawdown(dates, index):
+    """Largest peak-to-trough fall of a growth index, with peak, trough and recovery dates"""
+    peaks = np.maximum.accumulate(index)
+    drawdowns = index / peaks - 1
+    trough = int(np.argmin(drawdowns))
+    peak = int(np.argmax(index[:trough + 1]))
+    recovered = np.flatnonzero(index[trough:] >= index[peak])
+    return {
+        'maxDrawdown': round(float(drawdowns[trough]) * 100, 2),
+        'peakDate': str(dates[peak]),
+        'troughDate': str(dates[trough]),
+        'recoveryDate': str(dates[trough + recovered[0]]) if len(recovered) else None
+    }
+
+def rolling_cagr(dates, index, years):
+    """CAGR over every trailing `years` window ending at each date (start located by binary search)"""
+    span = np.timedelta64(int(round(years * 365.25)), 'D')
+    starts = np.searchsorted(dates, dates - span, side='left')
+    # Only windows whose start point is close to the exact start date count
+    valid = (starts < np.arange(len(dates))) & (dates[starts] - (dates - span) <= np.timedelta64(7, 'D'))
+    if not valid.any():
+        return None
+    ends = np.flatnonzero(valid)
+    elapsed = (dates[ends] - dates[starts[ends]]).astype(np.float64) / 365.25
+    cagr = (index[ends] / index[starts[ends]]) ** (1 / elapsed) - 1
+    return {
+        'latest': round(float(cagr[-1]) * 100, 2),
+        'median': round(float(np.median(cagr)) * 100, 2),
+        'min': round(float(cagr.min()) * 100, 2),
+        'max': round(float(cagr.max()) * 100, 2)
+    }
+
+def compute_risk_metrics(dates, values, invested=None, window=30, risk_free=RISK_FREE_RATE):
+    """Volatility, drawdown, Sharpe/Sortino and rolling CAGR for one value column.
+
+    When an invested series is given, period returns are net of contributions
+    (time-weighted) so SIP inflows are not mistaken for gains.
+    """
+    valid = ~np.isnan(values) & (values > 0)
+    dates, values = dates[valid], values[valid]
+    if len(values) < 3:
+        return None
+    flows = np.diff(invested[valid]) if invested is not None else np.zeros(len(values) - 1)
+    returns = (values[1:] - flows) / values[:-1] - 1
+    index = np.concatenate([[1.0], np.cumprod(1 + returns)])
+
+    spacing = float(np.median(np.diff(dates).astype(np.float64)))
+    periods_per_year = 365.25 / max(spacing, 1.0)
+    mean, std = returns.mean(), returns.std(ddof=1)
+    period_rf = (1 + risk_free) ** (1 / periods_per_year) - 1
+    downside = np.sqrt(np.mean(np.minimum(returns - period_rf, 0) ** 2))
+
+    window = min(window, len(returns))
+    sums = rolling_sum(returns, window)
+    squares = rolling_sum(returns ** 2, window)
+    rolling_var = np.maximum((squares - sums ** 2 / window) / max(window - 1, 1), 0)
+    rolling_vol = np.sqrt(rolling_var * periods_per_year) * 100
+
+    date_labels = np.datetime_as_string(dates, unit='D')
+    years = (dates[-1] - dates[0]).astype(np.float64) / 365.25
+    metrics = {
+        'from': str(date_labels[0]),
+        'to': str(date_labels[-1]),
+        'observations': int(len(values)),
+        'periodsPerYear': round(periods_per_year, 2),
+        'cagr': round(float(index[-1] ** (1 / years) - 1) * 100, 2) if years > 0 else None,
+        'volatility': round(float(std * np.sqrt(periods_per_year)) * 100, 2),
+        'rollingVolatility': {
+            'window': int(window),
+            'latest': round(float(rolling_vol[-1]), 2),
+            'min': round(float(rolling_vol.min()), 2),
+            'max': round(float(rolling_vol.max()), 2)
+        },
+        'sharpe': round(float((mean - period_rf) / std * np.sqrt(periods_per_year)), 2) if std > 0 else None,
+        'sortino': round(float((mean - period_rf) / downside * np.sqrt(periods_per_year)), 2) if downside > 0 else None,
+        'rollingCagr': {f"{y}y": rolling_cagr(dates, index, y) for y in CAGR_YEARS}
+    }
+    metrics.update(max_drawdown(date_labels, index))
+    return metrics
+
+def get_risk_metrics(window=30, risk_free=RISK_FREE_RATE):
+    """Risk metrics for every column of every Historical sheet, cached per history version"""
+    key = (cache_manager.version('history'), window, risk_free)
+    with _risk_lock:
+        if key in _risk_cache:
+            return _risk_cache[key]
+
+    result = {}
+    for title, frame in get_history_frames().items():
+        invested_column = frame.invested_column()
+        value_column = frame.value_column()
+        columns = {}
+        for name, values in frame.columns.items():
+            # Only the portfolio value column is adjusted for the invested column's flows
+            invested = frame.columns[invested_column] if (invested_column and name == value_column) else None
+            metrics = compute_risk_metrics(frame.dates, values, invested, window, risk_free)
+            if metrics is not None:
+                columns[name] = metrics
+        result[title] = columns
+
+    with _risk_lock:
+        _risk_cache.clear()  # Only the latest history version is worth keeping
+        _risk_cache[key] = result
+    return result
+
+# ============================================================
+# Tax Lots & Capital Gains
+# ============================================================
+
+# Minimum holding period (days) for a long-term gain, by asset type keyword (first match wins)
+LONG_TERM_THRESHOLDS = [
+    ('equity', 365), ('stock', 365), ('share', 365), ('etf', 365),
+    ('gold', 730), ('sgb', 730),
+    ('debt', 1095), ('bond', 1095),
+]
+DEFAULT_LONG_TERM_DAYS = 1095
+
+def long_term_days(asset_class):
+    """Holding period after which a gain on this asset type is long-term"""
+    name = str(asset_class).lower()
+    for keyword, days in LONG_TERM_THRESHOLDS:
+        if keyword in name:
+            return days
+    return DEFAULT_LONG_TERM_DAYS
+
+def holding_period_days(buy_date, sell_date):
+    """Days from buy to sell, counted as match_tax_lots does ('' while the lot is still open)"""
+    bought, sold = parse_date(buy_date), parse_date(sell_date)
+    if bought is None or sold is None:
+        return ''
+    return (sold - bought).days
+
+def financial_year(date):
+    """Indian financial year label (April-March), e.g. 2024-02-10 -> 'FY2023-24'"""
+    if date is None:
+        return ''
+    start = date.year if date.month >= 4 else date.year - 1
+    return f"FY{start}-{str(start + 1)[-2:]}"
+
+def match_tax_lots(snapshot):
+    """Match sells to buys FIFO per (security, account) and classify each matched lot.
+
+    Buy events come from investment rows; sell events from realised rows (the
+    sheet records the sale on the lot's own row) and explicit sell-type rows.
+    Events are date-sorted once with numpy, then each sell consumes the oldest
+    open lots from that security/account's deque. Returns the matched lots as
+    column arrays plus the sells that had no open lots left.
+    """
+    n_accounts = len(snapshot.account_names)
+    group = snapshot.security_codes * n_accounts + snapshot.account_codes
+
+    buys = np.flatnonzero(snapshot.is_investment & ~np.isnan(snapshot.buy_day))
+    lot_sells = np.flatnonzero(snapshot.is_investment & snapshot.realised & ~np.isnan(snapshot.sell_day))
+    sell_rows = snapshot.is_sell & (~np.isnan(snapshot.sell_day) | ~np.isnan(snapshot.buy_day))
+    explicit_sells = np.flatnonzero(sell_rows)
+
+    proceeds = np.where(snapshot.sell_value != 0, np.abs(snapshot.sell_value), np.abs(snapshot.value))
+    explicit_proceeds = np.where(snapshot.sell_value != 0, np.abs(snapshot.sell_value), np.abs(snapshot.invested))
+    sell_day = np.where(np.isnan(snapshot.sell_day), snapshot.buy_day, snapshot.sell_day)
+
+    rows = np.concatenate([buys, lot_sells, explicit_sells])
+    days = np.concatenate([snapshot.buy_day[buys], snapshot.sell_day[lot_sells], sell_day[explicit_sells]])
+    kinds = np.concatenate([np.zeros(len(buys)), np.ones(len(lot_sells)), np.ones(len(explicit_sells))]).astype(np.int8)
+    amounts = np.concatenate([np.abs(snapshot.invested[buys]), proceeds[lot_sells], explicit_proceeds[explicit_sells]])
+    # Same-day buys are processed before sells
+    order = np.lexsort((kinds, days))
+
+    open_lots = {}
+    matched = []
+    unmatched = []
+    for row, day, kind, amount in zip(rows[order].tolist(), days[order].tolist(), kinds[order].tolist(), amounts[order].tolist()):
+        units = abs(snapshot.units[row])
+        lots = open_lots.setdefault(group[row], deque())
+        if kind == 0:
+            if units > 0:
+                lots.append([units, amount / units, day, row])
+            continue
+
+        remaining = units
+        price = amount / units if units > 0 else 0
+        threshold = long_term_days(snapshot.class_names[snapshot.class_codes[row]])
+        while remaining > 1e-9 and lots:
+            lot = lots[0]
+            quantity = min(lot[0], remaining)
+            held = int(day - lot[2])
+            matched.append((row, lot[3], quantity, lot[1] * quantity, price * quantity, held, held > threshold))
+            lot[0] -= quantity
+            remaining -= quantity
+            if lot[0] <= 1e-9:
+                lots.popleft()
+        if remaining > 1e-9:
+            unmatched.append((row, remaining))
+
+    fields = ['sell_row', 'buy_row', 'units', 'cost', 'proceeds', 'holding_days', 'long_term']
+    dtypes = [np.int64, np.int64, np.float64, np.float64, np.float64, np.int64, bool]
+    columns = list(zip(*matched)) if matched else [[] for _ in fields]
+    lots = {name: np.array(values, dtype=dtype) for name, values, dtype in zip(fields, columns, dtypes)}
+    return lots, unmatched
+
+def capital_gains_report(snapshot):
+    """Realised gains per financial year split into short/long term and asset class (memoized per snapshot)"""
+    return snapshot._memo('capital_gains', lambda: _build_capital_gains(snapshot))
+
+def _build_capital_gains(snapshot):
+    lots, unmatched = match_tax_lots(snapshot)
+    sell_days = np.where(np.isnan(snapshot.sell_day), snapshot.buy_day, snapshot.sell_day)[lots['sell_row']]
+    # Financial year starts in April: shift back three months and take the calendar year
+    months = sell_days.astype(np.int64).astype('datetime64[D]').astype('datetime64[M]') - np.timedelta64(3, 'M')
+    fy_start = months.astype('datetime64[Y]').astype(np.int64) + 1970
+    lots['fy_start'] = fy_start
+    gains = lots['proceeds'] - lots['cost']
+
+    # Grouped sums over encoded (year, class, term) keys
+    years, year_codes = np.unique(fy_start, return_inverse=True)
+    n_classes = len(snapshot.class_names)
+    class_codes = snapshot.class_codes[lots['sell_row']]
+    term_codes = lots['long_term'].astype(np.int64)
+    keys = (year_codes * n_classes + class_codes) * 2 + term_codes
+    size = len(years) * n_classes * 2
+    by_key = np.bincount(keys, weights=gains, minlength=size).reshape(len(years), n_classes, 2)
+    present = np.bincount(keys, minlength=size).reshape(len(years), n_classes, 2) > 0
+    proceeds = np.bincount(year_codes, weights=lots['proceeds'], minlength=len(years))
+    cost = np.bincount(year_codes, weights=lots['cost'], minlength=len(years))
+
+    financial_years = []
+    for y, start in enumerate(years.tolist()):
+        short_term, long_term = by_key[y].sum(axis=0)
+        financial_years.append({
+            'fy': f"FY{start}-{str(start + 1)[-2:]}",
+            'shortTerm': round(float(short_term), 2),
+            'longTerm': round(float(long_term), 2),
+            'total': round(float(short_term + long_term), 2),
+            'proceeds': round(float(proceeds[y]), 2),
+            'cost': round(float(cost[y]), 2),
+            'byAssetClass': {
+                snapshot.class_names[c]: {'shortTerm': round(float(by_key[y, c, 0]), 2), 'longTerm': round(float(by_key[y, c, 1]), 2)}
+                for c in range(n_classes) if present[y, c].any()
+            }
+        })
+    return {
+        'financialYears': financial_years,
+        'lots': lots,
+        'unmatchedSells': [
+            {'id': snapshot.transactions[row].get('id'), 'security': snapshot.security_names[snapshot.security_codes[row]], 'units': round(float(units), 4)}
+            for row, units in unmatched
+        ]
+    }
+
+def capital_gains_lots(snapshot, fy):
+    """Matched lots sold in one financial year, formatted for the report"""
+    report = capital_gains_report(snapshot)
+    lots = report['lots']
+    try:
+        start = int(fy[2:6])
+    except ValueError:
+        return []
+
+    def label(day):
+        return datetime.fromordinal(int(day) + EPOCH_ORDINAL).strftime('%Y-%m-%d')
+
+    sell_days = np.where(np.isnan(snapshot.sell_day), snapshot.buy_day, snapshot.sell_day)
+    result = []
+    for i in np.flatnonzero(lots['fy_start'] == start).tolist():
+        sell_row, buy_row = int(lots['sell_row'][i]), int(lots['buy_row'][i])
+        cost, proceeds = float(lots['cost'][i]), float(lots['proceeds'][i])
+        result.append({
+            'security': snapshot.security_names[snapshot.security_codes[sell_row]],
+            'account': snapshot.account_names[snapshot.account_codes[sell_row]],
+            'assetClass': snapshot.class_names[snapshot.class_codes[sell_row]],
+            'buyId': snapshot.transactions[buy_row].get('id'),
+            'sellId': snapshot.transactions[sell_row].get('id'),
+            'buyDate': label(snapshot.buy_day[buy_row]),
+            'sellDate': label(sell_days[sell_row]),
+            'units': round(float(lots['units'][i]), 4),
+            'cost': round(cost, 2),
+            'proceeds': round(proceeds, 2),
+            'gain': round(proceeds - cost, 2),
+            'holdingDays': int(lots['holding_days'][i]),
+            'term': 'longTerm' if lots['long_term'][i] else 'shortTerm'
+        })
+    return result
+
+# ============================================================
+# Income (Dividends & Interest)
+# ============================================================
+
+TRAILING_INCOME_DAYS = 365
+
+def income_report(snapshot):
+    """Dividend and interest income by month, FY, security and account (memoized per snapshot)"""
+    return snapshot._memo('income', lambda: _build_income(snapshot))
+
+def _build_income(snapshot):
+    # Same rows and amounts as the overview's dividends: realised entries, Gain/Loss column
+    income = snapshot.realised & (snapshot.is_dividend | snapshot.is_interest) & ~(
+        np.isnan(snapshot.sell_day) & np.isnan(snapshot.buy_day))
+    rows = np.flatnonzero(income)
+    days = np.where(np.isnan(snapshot.sell_day), snapshot.buy_day, snapshot.sell_day)[rows].astype(np.int64)
+    amounts = snapshot.gain_loss[rows]
+    kinds = snapshot.is_interest[rows].astype(np.int64)  # 0 = dividend, 1 = interest
+
+    # Date buckets: calendar month, and financial year via a three-month shift
+    months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    fy_starts = (months - 3) // 12 + 1970
+
+    def by_bucket(values):
+        buckets, codes = np.unique(values, return_inverse=True)
+        totals = np.bincount(codes * 2 + kinds, weights=amounts, minlength=len(buckets) * 2).reshape(-1, 2)
+        return buckets.tolist(), totals
+
+    month_buckets, month_totals = by_bucket(months)
+    fy_buckets, fy_totals = by_bucket(fy_starts)
+
+    def bucket_rows(labels, totals):
+        return [{
+            'period': label,
+            'dividends': round(float(dividend), 2),
+            'interest': round(float(interest), 2),
+            'total': round(float(dividend + interest), 2)
+        } for label, (dividend, interest) in zip(labels, totals.tolist())]
+
+    # Trailing-twelve-month income against the cost of currently open positions
+    today = datetime.now().toordinal() - EPOCH_ORDINAL
+    trailing = days > today - TRAILING_INCOME_DAYS
+
+    def by_category(names, codes):
+        size = len(names)
+        row_codes = codes[rows]
+        total = np.bincount(row_codes, weights=amounts, minlength=size)
+        ttm = np.bincount(row_codes[trailing], weights=amounts[trailing], minlength=size)
+        count = np.bincount(row_codes, minlength=size)
+        invested = snapshot._sum_by(codes, snapshot.invested, snapshot.holding_mask, size)
+        result = []
+        for code in np.flatnonzero(count).tolist():
+            result.append({
+                'name': names[code],
+                'total': round(float(total[code]), 2),
+                'trailing12m': round(float(ttm[code]), 2),
+                'invested': round(float(invested[code]), 2),
+                'yield': round(float(ttm[code] / invested[code] * 100), 2) if invested[code] > 0 else None,
+                'payments': int(count[code])
+            })
+        result.sort(key=lambda r: r['total'], reverse=True)
+        return result
+
+    ttm_total = float(amounts[trailing].sum())
+    invested_total = float(snapshot.invested[snapshot.holding_mask].sum())
+    return {
+        'totalDividends': round(float(amounts[kinds == 0].sum()), 2),
+        'totalInterest': round(float(amounts[kinds == 1].sum()), 2),
+        'trailing12m': round(ttm_total, 2),
+        'trailingYield': round(ttm_total / invested_total * 100, 2) if invested_total > 0 else None,
+        'monthly': bucket_rows([str(np.datetime64(m, 'M')) for m in month_buckets], month_totals),
+        'financialYears': bucket_rows([f"FY{y}-{str(y + 1)[-2:]}" for y in fy_buckets], fy_totals),
+        'bySecurity': by_category(snapshot.security_names, snapshot.security_codes),
+        'byAccount': by_category(snapshot.account_names, snapshot.account_codes)
+    }
+
+# ============================================================
+# Precompute Scheduler
+# ============================================================
+
+# PRECOMPUTE=1 refreshes the sheets in the background ahead of their TTLs and rebuilds the
+# derived views off the request path. Intervals are in seconds, per job.
+PRECOMPUTE = os.environ.get('PRECOMPUTE', '').lower() in ('1', 'true', 'yes')
+DEFAULT_PRECOMPUTE_INTERVALS = 'transactions=240,goals=240,history=840'
+
+def parse_precompute_intervals(spec):
+    """Parse "job=seconds,..." (jobs left out, or set to 0, do not run).
+
+    A malformed entry is skipped, falling back to that job's default interval;
+    returns the intervals and the skipped entries.
+    """
+    defaults = dict((name, float(seconds)) for name, _, seconds in
+                    (item.partition('=') for item in DEFAULT_PRECOMPUTE_INTERVALS.split(',')))
+    intervals, invalid = {}, []
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        name, _, seconds = item.partition('=')
+        name = name.strip()
+        try:
+            value = float(seconds)
+        except ValueError:
+            value = None
+        if value is None or not value >= 0:
+            invalid.append(item.strip())
+            if name in defaults:
+                intervals[name] = defaults[name]
+            continue
+        intervals[name] = value
+    return intervals, invalid
+
+PRECOMPUTE_INTERVALS, _invalid_intervals = parse_precompute_intervals(
+    os.environ.get('PRECOMPUTE_INTERVALS', DEFAULT_PRECOMPUTE_INTERVALS))
+if _invalid_intervals:
+    logger.warning(f"Ignoring malformed PRECOMPUTE_INTERVALS entries: {', '.join(_invalid_intervals)}")
+PRECOMPUTE_JITTER = float(os.environ.get('PRECOMPUTE_JITTER', 0.1))  # +/- fraction of the interval
+PRECOMPUTE_MAX_BACKOFF = float(os.environ.get('PRECOMPUTE_MAX_BACKOFF', 600))
+
+def warm_snapshot(snapshot):
+    """Build the views and XIRRs the GET handlers read, so they become memo lookups"""
+    snapshot.overview()
+    snapshot.holdings()
+    snapshot.holdings('realized')
+    snapshot.account_summary()
+    snapshot.class_partitions()
+    income_report(snapshot)
+    capital_gains_report(snapshot)
+
+def refreshed_elsewhere(cache_key):
+    """Whether another worker refreshed this key in the shared cache within the last half interval"""
+    if cache_manager.shared is None or not cache_manager.is_fresh(cache_key):
+        return False
+    return time.time() - cache_manager.cache[cache_key]['timestamp'] < PRECOMPUTE_INTERVALS.get(cache_key, 0) / 2
+
+def refresh_transactions():
+    """Re-fetch the ledger; when it changed, build and warm the new snapshot before swapping it in"""
+    global _snapshot, _revalued
+    if refreshed_elsewhere('transactions'):
+        warm_snapshot(get_portfolio_snapshot())
+        return 'fresh in shared cache'
+    # A write landing while the new snapshot is built invalidates this version; the
+    # refreshed ledger is then dropped rather than overwriting the write
+    version = cache_manager.version('transactions')
+    transactions = fetch_transactions_from_sheets()
+    if transactions is None:
+        raise RuntimeError("Transactions fetch failed")
+    if transactions == cache_manager.get_stale('transactions'):
+        cache_manager.touch('transactions')
+        warm_snapshot(get_portfolio_snapshot())
+        return 'unchanged'
+
+    price_store.ensure_loaded()
+    snapshot = PortfolioSnapshot(transactions)
+    served = snapshot.revalue(price_store) if price_store.prices else snapshot
+    warm_snapshot(served)
+    with _snapshot_lock:
+        if not cache_manager.set('transactions', transactions, if_version=version):
+            return 'superseded by a write' if cache_manager.version('transactions') != version else 'too large to cache'
+        snapshot.version = served.version = cache_manager.version('transactions')
+        _snapshot = snapshot
+        _revalued = served if served is not snapshot else None
+    return f"{len(transactions)} transactions"
+
+def refresh_goals():
+    if refreshed_elsewhere('goals'):
+        return 'fresh in shared cache'
+    version = cache_manager.version('goals')
+    goals = fetch_goals_from_sheets()
+    if goals is None:
+        raise RuntimeError("Goals fetch failed")
+    if goals == cache_manager.get_stale('goals'):
+        cache_manager.touch('goals')
+        return 'unchanged'
+    if not cache_manager.set('goals', goals, if_version=version):
+        return 'superseded by a write'
+    return f"{len(goals)} goals"
+
+def refresh_history():
+    if refreshed_elsewhere('history'):
+        return 'fresh in shared cache'
+    version = cache_manager.version('history')
+    frames = get_history_frames(force=True, strict=True)  # raises on a failed read, so the job backs off
+    get_risk_metrics()
+    return 'unchanged' if cache_manager.version('history') == version else f"{sum(len(f) for f in frames.values())} rows"
+
+PRECOMPUTE_JOBS = {
+    'transactions': refresh_transactions,
+    'goals': refresh_goals,
+    'history': refresh_history
+}
+
+class PrecomputeScheduler:
+    """Runs refresh jobs on a single background thread with jittered intervals and error backoff"""
+
+    def __init__(self, jobs, intervals):
+        self.jobs = jobs
+        self.status = {
+            name: {'interval': intervals.get(name), 'lastRun': None, 'lastDurationMs': None,
+                   'lastResult': None, 'lastError': None, 'failures': 0, 'nextRun': None}
+            for name in jobs if intervals.get(name)
+        }
+        self.thread = None
+
+    def _next_delay(self, name):
+        state = self.status[name]
+        if state['failures']:
+            # Retry sooner than the cadence, backing off exponentially while Sheets keeps failing
+            delay = min(30 * 2 ** (state['failures'] - 1), PRECOMPUTE_MAX_BACKOFF)
+        else:
+            delay = state['interval']
+        # Jitter keeps workers and jobs from hitting the Sheets quota in lockstep
+        return delay * (1 + random.uniform(-PRECOMPUTE_JITTER, PRECOMPUTE_JITTER))
+
+    def run_job(self, name):
+        state = self.status[name]
+        started = time.time()
+        try:
+            state['lastResult'] = self.jobs[name]()
+            state['lastError'] = None
+            state['failures'] = 0
+            data_events.publish(name)
+        except Exception as e:
+            state['lastError'] = str(e)
+            state['failures'] += 1
+            logger.warning(f"⚠ Precompute job '{name}' failed ({state['failures']} in a row): {e}")
+        state['lastRun'] = datetime.fromtimestamp(started).isoformat(timespec='seconds')
+        state['lastDurationMs'] = round((time.time() - started) * 1000, 1)
+
+    def _loop(self):
+        ensure_google_sheets()
+        if not gs_client:
+            logger.warning("⚠ Precompute scheduler idle: running in mock mode")
+            return
+        # Run every job once at startup, then keep each on its own jittered cadence
+        queue = [(time.time(), name) for name in self.status]
+        heapq.heapify(queue)
+        while True:
+            due, name = heapq.heappop(queue)
+            time.sleep(max(due - time.time(), 0))
+            self.run_job(name)
+            next_run = time.time() + self._next_delay(name)
+            self.status[name]['nextRun'] = datetime.fromtimestamp(next_run).isoformat(timespec='seconds')
+            heapq.heappush(queue, (next_run, name))
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._loop, name='precompute', daemon=True)
+            self.thread.start()
+            cadence = ', '.join(f"{name} every {state['interval']:g}s" for name, state in self.status.items())
+            logger.info(f"✓ Precompute scheduler started ({cadence})")
+
+precompute_scheduler = PrecomputeScheduler(PRECOMPUTE_JOBS, PRECOMPUTE_INTERVALS)
+
+# ============================================================
+# Live Updates (Server-Sent Events)
+# ============================================================
+
+# Clients keep /api/v1/events open and refetch only when a data version changes
+EVENTS_HEARTBEAT = float(os.environ.get('EVENTS_HEARTBEAT', 15))  # seconds between keep-alive comments
+EVENTS_RETRY_MS = 3000  # reconnect delay suggested to EventSource clients
+# Changes to these data versions alter the overview, so they resend its changed fields
+OVERVIEW_SOURCES = {'transactions', 'prices'}
+
+def data_versions():
+    versions = {key: cache_manager.version(key) for key in cache_manager.cache}
+    price_store.sync()
+    versions['prices'] = price_store.version
+    return versions
+
+class DataEvents:
+    """Publishes a compact event whenever a data version changes.
+
+    publish() is cheap and a no-op when nothing changed, so it is called
+    after writes, precompute jobs and snapshot rebuilds, and on every
+    heartbeat to pick up writes made by other worker processes.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._waiters = set()  # (loop, asyncio.Event) of streams served by asgi_app
+        self.seq = 0
+        self.versions = None
+        self.event = None
+
+    def publish(self, reason):
+        versions = data_versions()
+        with self._cond:
+            if versions == self.versions:
+                return None
+            changed = sorted(key for key in versions if self.versions is None or versions[key] != self.versions[key])
+            self.seq += 1
+            self.versions = versions
+            self.event = {
+                "id": '.'.join(str(versions[key]) for key in sorted(versions)),
+                "reason": reason,
+                "changed": changed,
+                "versions": versions
+            }
+            self._cond.notify_all()
+            waiters = list(self._waiters)
+        for loop, ready in waiters:
+            loop.call_soon_threadsafe(ready.set)
+        return self.event
+
+    def current(self):
+        if self.event is None:
+            self.publish('startup')
+        with self._cond:
+            return self.seq, self.event
+
+    def wait(self, seq, timeout):
+        """(seq, event) once an event newer than seq is published, (seq, None) after timeout"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > seq, timeout)
+        if self.seq == seq and cache_manager.shared is not None:
+            self.publish('sync')
+        with self._cond:
+            return (self.seq, self.event) if self.seq > seq else (seq, None)
+
+    async def wait_async(self, seq, timeout):
+        """wait() for the event loop: no thread is held while the stream is idle"""
+        loop = asyncio.get_running_loop()
+        waiter = (loop, asyncio.Event())
+        with self._cond:
+            self._waiters.add(waiter)
+        try:
+            if self.seq == seq:
+                await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            if cache_manager.shared is not None:
+                await loop.run_in_executor(_fetch_pool, self.publish, 'sync')
+        finally:
+            with self._cond:
+                self._waiters.discard(waiter)
+        with self._cond:
+            return (self.seq, self.event) if self.seq > seq else (seq, None)
+
+data_events = DataEvents()
+
+class EventStream:
+    """One subscriber's view of data_events, rendered as Server-Sent Events"""
+
+    def __init__(self, last_event_id=None, aggregates=None):
+        self.last_event_id = last_event_id
+        self.aggregates = aggregates == 'overview'
+        self.overview = None
+        self.seq = 0
+
+    def start(self):
+        self.seq, event = data_events.current()
+        chunks = [f"retry: {EVENTS_RETRY_MS}\n\n"]
+        # A reconnecting client that already has the current versions gets nothing until the next change
+        if event['id'] != self.last_event_id:
+            chunks.append(self.render(event))
+        return chunks
+
+    def render(self, event):
+        payload = dict(event)
+        if self.aggregates and (self.overview is None or OVERVIEW_SOURCES & set(event['changed'])):
+            overview = get_portfolio_snapshot().overview()
+            diff = {field: value for field, value in overview.items()
+                    if self.overview is None or self.overview.get(field) != value}
+            self.overview = overview
+            if diff:
+                payload['overview'] = diff
+        return f"id: {event['id']}\nevent: data-version\ndata: {app.json.dumps(payload)}\n\n"
+
+# ============================================================
+# API ENDPOINTS
+# ============================================================
+
+# Request metrics (Prometheus text format on /api/v1/metrics)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class RequestMetrics:
+    """Per-endpoint request counts and latency histograms, plus time spent per request phase"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}  # (endpoint, method, status) -> count
+        self.latency = {}  # endpoint -> [count per bucket (last is +Inf), sum, count]
+        self.phases = {}  # phase -> [seconds, calls]
+
+    def observe(self, endpoint, method, status, seconds, phases):
+        with self._lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.latency.setdefault(endpoint, [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0])
+            bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+            histogram[0][bucket] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+            for phase, (phase_seconds, calls) in phases.items():
+                entry = self.phases.setdefault(phase, [0.0, 0])
+                entry[0] += phase_seconds
+                entry[1] += calls
+
+    def render(self):
+        def label(value):
+            return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            # samples are (labels, value) or, for histograms, (suffix, labels, value)
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample in samples:
+                suffix, labels, value = sample if len(sample) == 3 else ('', *sample)
+                rendered = ','.join(f'{k}="{label(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{suffix}{{{rendered}}} {value}" if rendered else f"{name}{suffix} {value}")
+
+        with self._lock:
+            metric('wealth_http_requests_total', 'counter', 'HTTP requests by endpoint, method and status.',
+                   [({'endpoint': e, 'method': m, 'status': s}, n) for (e, m, s), n in sorted(self.requests.items())])
+            samples = []
+            for endpoint, (buckets, total, count) in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, n in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+                    cumulative += n
+                    samples.append(('_bucket', {'endpoint': endpoint, 'le': bound}, cumulative))
+                samples.append(('_sum', {'endpoint': endpoint}, round(total, 6)))
+                samples.append(('_count', {'endpoint': endpoint}, count))
+            metric('wealth_http_request_duration_seconds', 'histogram', 'Request latency by endpoint.', samples)
+            metric('wealth_request_phase_seconds_total', 'counter', 'Time spent in each request phase (nested phases excluded).',
+                   [({'phase': p}, round(v[0], 6)) for p, v in sorted(self.phases.items())])
+            metric('wealth_request_phase_calls_total', 'counter', 'Number of timed sections per request phase.',
+                   [({'phase': p}, v[1]) for p, v in sorted(self.phases.items())])
+
+        sheets = sheets_guard.get_stats()
+        metric('wealth_sheets_api_calls_total', 'counter', 'Google Sheets API requests (including retries).', [({}, sheets['calls'])])
+        metric('wealth_sheets_api_retries_total', 'counter', 'Google Sheets API retries.', [({}, sheets['retries'])])
+        metric('wealth_sheets_api_throttled_total', 'counter', 'Requests delayed by the per-minute quota meter.', [({}, sheets['throttled'])])
+        metric('wealth_sheets_api_errors_total', 'counter', 'Google Sheets API errors by kind.',
+               [({'kind': kind}, n) for kind, n in sheets['errors'].items()])
+        metric('wealth_sheets_circuit_open', 'gauge', '1 while the Sheets circuit breaker is open.',
+               [({}, int(sheets['circuit'] != 'closed'))])
+
+        cache = cache_manager.get_stats()
+        metric('wealth_cache_hits_total', 'counter', 'Sheet cache hits by key.', [({'key': k}, v['hits']) for k, v in cache.items()])
+        metric('wealth_cache_misses_total', 'counter', 'Sheet cache misses by key.', [({'key': k}, v['misses']) for k, v in cache.items()])
+        metric('wealth_cache_data_version', 'gauge', 'Current data version by key.', [({'key': k}, v['version']) for k, v in cache.items()])
+        return '\n'.join(lines) + '\n'
+
+request_metrics = RequestMetrics()
+
+@app.after_request
+def add_server_timing(response):
+    """Report the request's phase timings in a Server-Timing header and record its metrics"""
+    phases = _request_phases.get()
+    started = g.get('request_started')
+    if phases is None or started is None:
+        return response
+    total = time.perf_counter() - started
+    entries = [f'{phase};dur={seconds * 1000:.1f}' + (f';desc="{calls} calls"' if calls > 1 else '')
+               for phase, (seconds, calls) in phases.items()]
+    entries.append(f'total;dur={total * 1000:.1f}')
+    response.headers['Server-Timing'] = ', '.join(entries)
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    request_metrics.observe(endpoint, request.method, response.status_code, total, phases)
+    return response
+
+# On-demand profiling. Off unless PROFILING_ENABLED=1 and a PROFILE_TOKEN is set; the hooks
+# are not even registered otherwise. A request is profiled when it sends X-Profile-Token and
+# asks for it (X-Profile: 1 or ?profile=1, or ?profile=report to get the report as the
+# response), or when it is picked by PROFILE_SAMPLE_RATE. Reports are kept in memory.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_TOP = int(os.environ.get('PROFILE_TOP', 25))
+_profiles = deque(maxlen=int(os.environ.get('PROFILE_KEEP', 20)))
+
+def profile_authorized():
+    token = request.headers.get('X-Profile-Token', '')
+    return bool(PROFILE_TOKEN) and hmac.compare_digest(token, PROFILE_TOKEN)
+
+def profile_path():
+    """The request path and query string, without the API key"""
+    from urllib.parse import urlencode
+    query = urlencode([(k, v) for k, v in request.args.items(multi=True) if k != 'api_key'])
+    return f"{request.path}?{query}" if query else request.path
+
+def build_profile_report(profiler, duration):
+    """Top functions by cumulative and self time, each with its most expensive callees"""
+    import pstats
+    stats = pstats.Stats(profiler).stats  # func -> (primitive calls, calls, self time, cumulative, callers)
+
+    def name(func):
+        filename, line, function = func
+        return f"{function} ({os_module.path.basename(filename)}:{line})" if line else function
+
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (_, calls, _, cumulative) in callers.items():
+            callees.setdefault(caller, []).append((cumulative, calls, func))
+
+    def entry(func):
+        primitive, calls, self_time, cumulative, _ = stats[func]
+        return {
+            'function': name(func),
+            'calls': calls,
+            'primitiveCalls': primitive,
+            'selfMs': round(self_time * 1000, 2),
+            'cumulativeMs': round(cumulative * 1000, 2)
+        }
+
+    by_cumulative = sorted(stats, key=lambda f: stats[f][3], reverse=True)[:PROFILE_TOP]
+    by_self = sorted(stats, key=lambda f: stats[f][2], reverse=True)[:PROFILE_TOP]
+    return {
+        'id': uuid.uuid4().hex[:12],
+        'method': request.method,
+        'path': profile_path(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'durationMs': round(duration * 1000, 2),
+        'cumulative': [
+            {**entry(func), 'callees': [
+                {'function': name(callee), 'calls': calls, 'cumulativeMs': round(cumulative * 1000, 2)}
+                for cumulative, calls, callee in sorted(callees.get(func, []), key=lambda c: c[0], reverse=True)[:5]
+            ]}
+            for func in by_cumulative
+        ],
+        'self': [entry(func) for func in by_self]
+    }
+
+# Only one profiler can be active per process (Python 3.12+ raises otherwise), so
+# requests overlapping a profiled one simply go unprofiled
+_profile_lock = threading.Lock()
+
+def start_profiling():
+    requested = request.headers.get('X-Profile') == '1' or request.args.get('profile') in ('1', 'report')
+    sampled = PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+    if ((requested and profile_authorized()) or sampled) and _profile_lock.acquire(blocking=False):
+        import cProfile
+        try:
+            g.profile_started = time.perf_counter()
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+        except ValueError as e:  # another profiling tool is active
+            logger.warning(f"⚠ Profiling skipped: {e}")
+            g.pop('profiler', None)
+            _profile_lock.release()
+
+def stop_profiling():
+    """Disable this request's profiler and free the slot; returns the profiler or None"""
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profile_lock.release()
+    return profiler
+
+def finish_profiling(response):
+    profiler = stop_profiling()
+    if profiler is None:
+        return response
+    report = build_profile_report(profiler, time.perf_counter() - g.pop('profile_started'))
+    _profiles.append(report)
+    if request.args.get('profile') == 'report' and profile_authorized():
+        return jsonify(report)
+    response.headers['X-Profile-Id'] = report['id']
+    return response
+
+if PROFILING_ENABLED and PROFILE_TOKEN:
+    app.before_request(start_profiling)
+    app.after_request(finish_profiling)
+    app.teardown_request(lambda exc: stop_profiling())
+
+@app.route('/api/v1/profiles', methods=['GET'])
+@app.route('/api/v1/profiles/<profile_id>', methods=['GET'])
+def get_profiles(profile_id=None):
+    """Stored profiling reports (summaries, or one full report by id); requires X-Profile-Token"""
+    if not (PROFILING_ENABLED and PROFILE_TOKEN):
+        return jsonify({"error": "Profiling is disabled"}), 404
+    if not profile_authorized():
+        return jsonify({"error": "Invalid profile token"}), 403
+    if profile_id is None:
+        return jsonify({"profiles": [
+            {key: p[key] for key in ('id', 'method', 'path', 'timestamp', 'durationMs')} for p in reversed(_profiles)
+        ]})
+    report = next((p for p in _profiles if p['id'] == profile_id), None)
+    if report is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return jsonify(report)
+
+@app.before_request
+def wait_for_sheets():
+    """Data routes need the Sheets connection attempt to have finished (health check does not)"""
+    if request.method != 'OPTIONS' and request.path not in ('/', '/favicon.ico'):
+        with timed('connect'):
+            ensure_google_sheets()
+
+@app.after_request
+def publish_writes(response):
+    """Tell event stream subscribers about a successful write"""
+    if request.method in ('POST', 'PUT', 'DELETE') and response.status_code < 400:
+        data_events.publish('write')
+    return response
+
+@app.after_request
+def log_request(response):
+    """Log all HTTP requests"""
+    duration_ms = round((time.perf_counter() - g.get('request_started', time.perf_counter())) * 1000, 1)
+    logger.info("%s %s → %s (%s ms)", request.method, request.path, response.status_code, duration_ms,
+                extra={'event': 'request', 'fields': {'method': request.method, 'path': request.path,
+                                                      'status': response.status_code, 'duration_ms': duration_ms}})
+    return response
+
+@app.route('/')
+def home():
+    status = {
+        "message": "Wealth Management API",
+        "version": "1.0.0",
+        "status": "running",
+        "mode": ("mock" if not gs_client else "google-sheets") if _sheets_ready.is_set() else "connecting"
+    }
+    if STARTUP_TIMING:
+        status["startup"] = STARTUP_PHASES
+    return jsonify(status)
+
+@app.route('/api/v1/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get cache statistics"""
+    stats = cache_manager.get_stats()
+    return jsonify({
+        "cache_ttl_seconds": cache_manager.ttl,
+        "max_cache_size_mb": cache_manager.max_cache_size / 1024 / 1024,
+        "shared_cache": SHARED_CACHE_PATH if shared_cache else None,
+        "statistics": stats,
+        "transaction_changes": transaction_changes.get_stats()
+    })
+
+@app.route('/api/v1/metrics', methods=['GET'])
+def get_metrics():
+    """Request latency histograms, phase totals, Sheets API and cache counters in Prometheus text format"""
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/v1/precompute/status', methods=['GET'])
+def get_precompute_status():
+    """Last refresh time, duration and result per background precompute job"""
+    return jsonify({
+        "enabled": PRECOMPUTE,
+        "running": precompute_scheduler.thread is not None and precompute_scheduler.thread.is_alive(),
+        "jobs": precompute_scheduler.status
+    })
+
+@app.route('/api/v1/events', methods=['GET'])
+def stream_data_events():
+    """Server-Sent Events stream of data version changes
+
+    Each "data-version" event carries the current versions and which of them
+    changed; its id is accepted back as Last-Event-ID on reconnect.
+
+    Query params:
+    - aggregates: "overview" to include the changed overview fields in each event
+    - api_key: API key, for EventSource clients that cannot set headers
+    """
+    stream = EventStream(request.headers.get('Last-Event-ID'), request.args.get('aggregates'))
+
+    def generate():
+        yield from stream.start()
+        while True:
+            stream.seq, event = data_events.wait(stream.seq, EVENTS_HEARTBEAT)
+            yield ": keep-alive\n\n" if event is None else stream.render(event)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Portfolio Endpoints
+@app.route('/api/v1/portfolio/overview', methods=['GET'])
+def get_portfolio_overview():
+    """Get portfolio overview with total value and asset breakdown"""
+    if gs_client:
+        # Calculate from the shared snapshot of the Google Sheets transactions
+        return jsonify(get_portfolio_snapshot().overview())
+    
+    return jsonify(MOCK_PORTFOLIO_DATA)
+
+ASSET_SORT_FIELDS = ['value', 'invested', 'profit', 'profitPercent', 'realizedProfit', 'unrealizedProfit', 'units', 'name', 'xirr']
+
+@app.route('/api/v1/portfolio/assets/<asset_class>', methods=['GET'])
+def get_asset_detail(asset_class):
+    """Get detailed view of specific asset class
+
+    Query params: page, limit (default 50), sort (value, invested, profit,
+    profitPercent, realizedProfit, unrealizedProfit, units, name, xirr), order (asc/desc)
+    """
+    asset_class = asset_class.lower().replace('-', '_')
+    page = max(request.args.get('page', 1, type=int), 1)
+    limit = max(request.args.get('limit', 50, type=int), 1)
+    sort = request.args.get('sort', 'value')
+    order = request.args.get('order', 'desc')
+    if sort not in ASSET_SORT_FIELDS:
+        return jsonify({"error": f"Unknown sort field: {sort}"}), 400
+
+    if gs_client:
+        snapshot = get_portfolio_snapshot()
+        partition = snapshot.class_partitions().get(url_key(asset_class))
+        if partition is None:
+            return jsonify({"error": "Asset class not found"}), 404
+        name, assets = partition['name'], partition['assets']
+        if sort == 'xirr':
+            # Sorting by XIRR needs every security's XIRR; other sorts only solve the page
+            xirrs = {id(asset): snapshot.asset_xirr(asset) for asset in assets}
+            sort_key = lambda a: (xirrs[id(a)] is not None, xirrs[id(a)] or 0)
+        else:
+            sort_key = lambda a: a[sort]
+    else:
+        snapshot = None
+        name, assets = asset_class, MOCK_ASSETS.get(asset_class, [])
+        sort_key = lambda a: (a.get(sort) is not None, a.get(sort) or 0) if sort != 'name' else a['name']
+
+    ordered = sorted(assets, key=sort_key, reverse=(order != 'asc'))
+    page_rows = ordered[(page - 1) * limit:page * limit]
+    if snapshot is not None:
+        page_rows = [
+            {**{k: v for k, v in asset.items() if not k.startswith('_')}, 'xirr': snapshot.asset_xirr(asset)}
+            for asset in page_rows
+        ]
+
+    return jsonify({
+        "assetClass": name,
+        "assets": page_rows,
+        "total": len(assets),
+        "page": page,
+        "limit": limit
+    })
+
+def build_performance_series(start=None, end=None, points=DEFAULT_PERFORMANCE_POINTS, source='Historical', freq='daily'):
+    """Historical portfolio performance points for charts
+
+    Served from the Historical sheet when it has enough rows, otherwise (or
+    with source='ledger') reconstructed from the transaction ledger.
+    """
+    if gs_client:
+        frame = get_history_frames().get(source) if source != 'ledger' else None
+        if frame is not None and len(frame) >= HISTORY_MIN_POINTS:
+            return history_performance_series(frame, start, end, points)
+        return ledger_performance_series(get_portfolio_snapshot(), start, end, points, freq)
+
+    # Mock historical data
+    return [
         {"date": "2024-01", "value": 1000000, "profit": 0},
         {"date": "2024-02", "value": 1050000, "profit": 50000},
         {"date": "2024-03", "value": 1100000, "profit": 50000},
@@ -1082,7 +4083,45 @@ def get_portfolio_performance():
         {"date": "2024-06", "value": 1200000, "profit": 50000},
         {"date": "2024-07", "value": 1250000, "profit": 50000}
     ]
-    return jsonify(performance_data)
+
+def portfolio_value_series():
+    """Unsampled (dates, values) of the portfolio value - Historical sheet if usable, else the ledger"""
+    frame = get_history_frames().get('Historical')
+    if frame is not None and len(frame) >= HISTORY_MIN_POINTS and frame.value_column():
+        values = frame.columns[frame.value_column()]
+        valid = ~np.isnan(values)
+        return frame.dates[valid], values[valid]
+    dates, values, _, _ = get_portfolio_snapshot().ledger_history('daily')
+    return dates, values
+
+def value_change(dates, values, days):
+    """Change of the latest value versus the last value on or before `days` earlier (binary search)"""
+    if len(dates) == 0:
+        return 0
+    idx = np.searchsorted(dates, dates[-1] - np.timedelta64(days, 'D'), side='right') - 1
+    if idx < 0:
+        return 0
+    return round(float(values[-1] - values[idx]), 2)
+
+@app.route('/api/v1/portfolio/performance', methods=['GET'])
+def get_portfolio_performance():
+    """Get historical portfolio performance data
+
+    Query params: from / to (YYYY-MM-DD), points (max points after downsampling),
+    source (Historical, Historical-Other or ledger), freq (daily or monthly, ledger only)
+    """
+    start = parse_date(request.args.get('from'))
+    end = parse_date(request.args.get('to'))
+    if (request.args.get('from') and not start) or (request.args.get('to') and not end):
+        return jsonify({"error": "Invalid date filter, expected YYYY-MM-DD"}), 400
+    points = request.args.get('points', DEFAULT_PERFORMANCE_POINTS, type=int)
+    source = request.args.get('source', 'Historical')
+    freq = request.args.get('freq', 'daily')
+    if source not in HISTORY_SHEETS + ['ledger']:
+        return jsonify({"error": f"Unknown history source: {source}"}), 400
+    if freq not in ('daily', 'monthly'):
+        return jsonify({"error": f"Unknown frequency: {freq}"}), 400
+    return jsonify(build_performance_series(start, end, points, source, freq))
 
 @app.route('/api/v1/portfolio/holdings', methods=['GET'])
 def get_holdings():
@@ -1091,138 +4130,53 @@ def get_holdings():
     goal_filter = request.args.get('goal')
     view_type = request.args.get('type', 'unrealized')
     
-    # Get transactions
-    if gs_client:
-        transactions = read_transactions_from_sheets()
-    else:
-        transactions = MOCK_TRANSACTIONS
-    
-    if view_type == 'realized':
-        # Filter for realized transactions (Sold or Dividend) where gain/loss is recorded
-        realized_txns = [
-            txn for txn in transactions 
-            if str(txn.get('realised', 'FALSE')).upper() == 'TRUE'
-        ]
-        
-        # Filter by asset class if provided
-        if asset_class_filter:
-            realized_txns = [txn for txn in realized_txns if txn.get('assetClass') == asset_class_filter]
-
-        # Filter by goal (account) if provided
-        if goal_filter:
-            realized_txns = [txn for txn in realized_txns if txn.get('account') == goal_filter]
-            
-        # Aggregate by security
-        holdings = {}
-        for txn in realized_txns:
-            security = txn.get('security', 'Unknown')
-            txn_type = txn.get('type')
-            
-            if security not in holdings:
-                holdings[security] = {
-                    'security': security,
-                    'assetClass': txn.get('assetClass', ''),
-                    'units': 0,
-                    'invested': 0, 
-                    'current_value': 0,
-                    'realized_pl': 0,
-                    'dividends': 0,
-                    'transactions': []
-                }
-            
-            # If Dividend, add to dividends
-            if txn_type == 'Dividend':
-                holdings[security]['dividends'] += float(txn.get('gainLoss', 0) or 0)
-            else:
-                # Realized Sell/Trade
-                holdings[security]['units'] += float(txn.get('units', 0) or 0)
-                holdings[security]['realized_pl'] += float(txn.get('gainLoss', 0) or 0)
-            
-            holdings[security]['transactions'].append(txn)
-            
-        result = []
-        for security, data in holdings.items():
-            result.append({
-                'security': security,
-                'assetClass': data['assetClass'],
-                'units': data['units'], # Sold units
-                'invested': 0, 
-                'currentValue': 0, 
-                'realizedPL': round(data['realized_pl'], 2),
-                'dividends': round(data['dividends'], 2),
-                'unrealizedPL': 0,
-                'unrealizedPLPercent': 0,
-                'xirr': None
-            })
-            
-        # Sort by realized PL + dividends descending
-        result.sort(key=lambda x: (x['realizedPL'] + x['dividends']), reverse=True)
-        
-    else:
-        # Existing Unrealized Logic
-        # Filter for unrealized transactions
-        unrealized_txns = [
-            txn for txn in transactions 
-            if str(txn.get('realised', 'FALSE')).upper() == 'FALSE' and 
-            txn.get('type', 'Invest') in ['Invest', 'Trade', 'Buy', 'BUY', 'SIP', 'SIP Installment', 'Purchase']
-        ]
-        
-        # Filter by asset class if provided
-        if asset_class_filter:
-            unrealized_txns = [txn for txn in unrealized_txns if txn.get('assetClass') == asset_class_filter]
-
-        # Filter by goal (account) if provided
-        if goal_filter:
-            unrealized_txns = [txn for txn in unrealized_txns if txn.get('account') == goal_filter]
-            
-        # Aggregate by security
-        holdings = {}
-        for txn in unrealized_txns:
-            security = txn.get('security', 'Unknown')
-            
-            if security not in holdings:
-                holdings[security] = {
-                    'security': security,
-                    'assetClass': txn.get('assetClass', ''),
-                    'units': 0,
-                    'invested': 0,
-                    'current_value': 0,
-                    'transactions': []
-                }
-                
-            holdings[security]['units'] += float(txn.get('units', 0) or 0)
-            holdings[security]['invested'] += float(txn.get('totalAmount', 0) or 0)
-            holdings[security]['current_value'] += float(txn.get('value', 0) or 0)
-            holdings[security]['transactions'].append(txn)
-            
-        # Calculate XIRR and format response
-        result = []
-        for security, data in holdings.items():
-            # Calculate XIRR for this security
-            xirr = calculate_xirr(data['transactions'])
-            
-            unrealized_pl = data['current_value'] - data['invested']
-            unrealized_pl_pct = (unrealized_pl / data['invested'] * 100) if data['invested'] > 0 else 0
-            
-            result.append({
-                'security': security,
-                'assetClass': data['assetClass'],
-                'units': data['units'],
-                'invested': round(data['invested'], 2),
-                'currentValue': round(data['current_value'], 2),
-                'unrealizedPL': round(unrealized_pl, 2),
-                'unrealizedPLPercent': round(unrealized_pl_pct, 2),
-                'xirr': xirr
-            })
-            
-        # Sort by value descending
-        result.sort(key=lambda x: x['currentValue'], reverse=True)
+    result = get_portfolio_snapshot().holdings(view_type, asset_class_filter, goal_filter)
     
     return jsonify({
         'holdings': result,
         'count': len(result)
     })
 
+DASHBOARD_SECTIONS = ['overview', 'allocation', 'goals', 'holdings', 'performance']
+
+@app.route('/api/v1/dashboard', methods=['GET'])
+def get_dashboard():
+    """Bundle overview, allocation, goal progress, top holdings and performance in one response
+
+    All sections are computed from the same transactions snapshot, so they are
+    consistent with each other and the ledger is aggregated only once.
+    Query params: include (comma-separated sections, default all), top (holdings count, default 10)
+    """
+    include = request.args.get('include')
+    sections = [s.strip() for s in include.split(',') if s.strip()] if include else DASHBOARD_SECTIONS
+    unknown = [s for s in sections if s not in DASHBOARD_SECTIONS]
+    if unknown:
+        return jsonify({"error": f"Unknown dashboard sections: {', '.join(unknown)}"}), 400
+    top = request.args.get('top', 10, type=int)
+
+    prefetch('transactions', *(['goals'] if 'goals' in sections else []),
+             *(['history'] if 'performance' in sections else []))
+    snapshot = get_portfolio_snapshot()
+    response = {'version': snapshot.version, 'priceVersion': snapshot.price_version}
+
+    if 'overview' in sections or 'allocation' in sections:
+        overview = snapshot.overview() if gs_client else MOCK_PORTFOLIO_DATA
+        if 'overview' in sections:
+            response['overview'] = {k: v for k, v in overview.items() if k not in ('allocation', 'assetBreakdown')}
+        if 'allocation' in sections:
+            response['allocation'] = overview.get('allocation', overview.get('assetBreakdown', []))
+
+    if 'goals' in sections:
+        response['goals'] = snapshot.goal_progress(read_goals_from_sheets()) if gs_client else MOCK_GOALS
+
+    if 'holdings' in sections:
+        response['holdings'] = snapshot.holdings()[:top]
+
+    if 'performance' in sections:
+        response['performance'] = build_performance_series(points=request.args.get('points', DEFAULT_PERFORMANCE_POINTS, type=int))
+
+    return jsonify(response)
+
 # Transaction Endpoints
 @app.route('/api/v1/transactions', methods=['GET', 'POST'])
 def handle_transactions():
@@ -1233,16 +4187,17 @@ def handle_transactions():
         
         # Get transactions from Google Sheets if connected, otherwise use mock data
         if gs_client:
-            transactions = read_transactions_from_sheets()
+            transactions, version = current_ledger()
         else:
-            transactions = MOCK_TRANSACTIONS
+            transactions, version = MOCK_TRANSACTIONS, None
         
         # Return paginated transactions
         return jsonify({
             "transactions": transactions,
             "total": len(transactions),
             "page": page,
-            "limit": limit
+            "limit": limit,
+            "version": version
         })
     
     elif request.method == 'POST':
@@ -1284,6 +4239,27 @@ def handle_transactions():
                 "message": "Transaction created (mock mode)"
             }), 201
 
+@app.route('/api/v1/transactions/changes', methods=['GET'])
+def get_transaction_changes():
+    """Transactions inserted, updated or deleted since a data version
+
+    Query params:
+    - since: "version" from /transactions or from a previous call
+    Returns the full ledger with "resync": true when the change log no longer
+    reaches back that far (or most of the ledger changed anyway).
+    """
+    since = request.args.get('since', type=int)
+    if gs_client:
+        transactions, version = current_ledger()
+        changes = transaction_changes.changes_since(since) if version == transaction_changes.version else None
+    else:
+        transactions, version, changes = MOCK_TRANSACTIONS, None, None
+
+    if changes is None:
+        return jsonify({"version": version, "since": since, "resync": True, "transactions": transactions})
+    upserted, deleted = changes
+    return jsonify({"version": version, "since": since, "resync": False, "upserted": upserted, "deleted": deleted})
+
 @app.route('/api/v1/transactions/<txn_id>', methods=['GET', 'PUT', 'DELETE'])
 def handle_transaction(txn_id):
     global MOCK_TRANSACTIONS
@@ -1304,8 +4280,8 @@ def handle_transaction(txn_id):
             if not txn:
                 return jsonify({"error": "Transaction not found"}), 404
             
-            # Update fields
-            txn.update(data)
+            # Update fields on a copy; the cached ledger is shared with the snapshot
+            txn = {**txn, **data}
             txn['totalAmount'] = float(txn['units']) * float(txn['pricePerUnit'])
             
             # Update in Google Sheets
@@ -1340,50 +4316,10 @@ def handle_goals():
     if request.method == 'GET':
         # Get goals from Google Sheets and calculate progress from transactions
         if gs_client:
+            prefetch('goals', 'transactions')
             goals = read_goals_from_sheets()
-            transactions = read_transactions_from_sheets()
-            
-            # Calculate unrealized holdings by account/goal name
-            account_values = {}
-            account_transactions = {}  # Store transactions per account for XIRR
-            for txn in transactions:
-                account = txn.get('account', '')
-                realised = str(txn.get('realised', 'FALSE')).upper()
-                
-                # Only count unrealized (active) holdings
-                if realised == 'TRUE':
-                    continue
-                
-                if account not in account_values:
-                    account_values[account] = 0
-                    account_transactions[account] = []
-                
-                account_values[account] += txn.get('value', 0)
-                account_transactions[account].append(txn)
-            
-            # Calculate XIRR per account
-            account_xirr = {}
-            for account, txns in account_transactions.items():
-                xirr = calculate_xirr(txns)
-                if xirr is not None:
-                    account_xirr[account] = xirr
-            
-            # Update goal progress based on account values
-            for goal in goals:
-                goal_name = goal.get('name', '')
-                # Match goal name to account name
-                current_value = account_values.get(goal_name, 0)
-                target_amount = goal.get('targetAmount', 0)
-                
-                # Update current value and progress
-                goal['value'] = current_value
-                if target_amount > 0:
-                    goal['progress'] = min((current_value / target_amount * 100), 100)
-                else:
-                    goal['progress'] = 0
-                
-                # Add XIRR for this goal
-                goal['xirr'] = account_xirr.get(goal_name)
+            # Value, progress and XIRR come from the account aggregates of the snapshot
+            goals = get_portfolio_snapshot().goal_progress(goals)
             
             return jsonify(goals)
         else:
@@ -1440,8 +4376,8 @@ def handle_goal(goal_id):
             if not goal:
                 return jsonify({"error": "Goal not found"}), 404
             
-            # Update fields
-            goal.update(data)
+            # Update fields on a copy; the cached goals are shared with other requests
+            goal = {**goal, **data}
             
             # Update in Google Sheets
             if update_goal_in_sheets(goal_id, goal):
@@ -1467,9 +4403,53 @@ def handle_goal(goal_id):
             MOCK_GOALS = [g for g in MOCK_GOALS if g['id'] != goal_id]
             return jsonify({"success": True, "message": "Goal deleted"})
 
+@app.route('/api/v1/goals/projections', methods=['GET'])
+def get_goal_projections():
+    """Monte Carlo probability of reaching each goal and the SIP required at given confidence levels
+
+    Query params: paths (default 20000), seed (default 42), sip (monthly SIP
+    assumed for the probability, default 0), confidence (comma-separated, default 0.5,0.75,0.9)
+    """
+    paths = min(max(request.args.get('paths', PROJECTION_PATHS, type=int), 100), 200000)
+    seed = request.args.get('seed', 42, type=int)
+    sip = request.args.get('sip', 0.0, type=float)
+    try:
+        confidence = tuple(float(c) for c in request.args.get('confidence', '0.5,0.75,0.9').split(','))
+    except ValueError:
+        return jsonify({"error": "Invalid confidence levels"}), 400
+    if not all(0 < c < 1 for c in confidence):
+        return jsonify({"error": "Confidence levels must be between 0 and 1"}), 400
+
+    if gs_client:
+        prefetch('transactions', 'goals', 'history')
+        snapshot = get_portfolio_snapshot()
+        goals = snapshot.goal_progress(read_goals_from_sheets())
+        version = (snapshot.data_version, cache_manager.version('goals'), cache_manager.version('history'))
+    else:
+        goals = MOCK_GOALS
+        version = None
+    return jsonify(project_goals(goals, paths, seed, sip, confidence, version))
+
 @app.route('/api/v1/goals/<goal_id>/progress', methods=['GET'])
 def get_goal_progress(goal_id):
-    """Get detailed progress for a specific goal"""
+    """Get detailed progress for a specific goal
+
+    Holdings are matched to the goal by account name, as in /goals.
+    """
+    if gs_client:
+        prefetch('goals', 'transactions')
+        goal = next((g for g in read_goals_from_sheets() if g['id'] == goal_id), None)
+        if not goal:
+            return jsonify({"error": "Goal not found"}), 404
+        snapshot = get_portfolio_snapshot()
+        goal = snapshot.goal_progress([goal])[0]
+        allocations, timeline = snapshot.goal_breakdown(goal.get('name', ''))
+        return jsonify({
+            "goal": goal,
+            "allocations": allocations,
+            "timeline": timeline
+        })
+
     details = MOCK_GOAL_DETAILS.get(goal_id, [])
     goal = next((g for g in MOCK_GOALS if g['id'] == goal_id), None)
     
@@ -1481,38 +4461,320 @@ def get_goal_progress(goal_id):
 # Analytics Endpoints
 @app.route('/api/v1/analytics/summary', methods=['GET'])
 def get_analytics_summary():
-    """Get analytics summary including XIRR, returns, etc."""
+    """Get analytics summary including XIRR, returns, etc.
+
+    Query params: top (number of gainers/losers, default 5)
+    """
+    if not gs_client:
+        return jsonify({
+            "xirr": 12.5,
+            "absoluteReturns": 300000,
+            "percentageReturns": 30.0,
+            "dayChange": 2500,
+            "weekChange": 15000,
+            "monthChange": 50000,
+            "topGainers": [
+                {"name": "TCS", "profit": 12512.5, "percentage": 7.82},
+                {"name": "HDFC Bank", "profit": 9950, "percentage": 6.41}
+            ],
+            "topLosers": []
+        })
+
+    top = request.args.get('top', 5, type=int)
+    snapshot = get_portfolio_snapshot()
+    overview = snapshot.overview()
+
+    # Partial selection over per-security P/L - O(n log top) instead of sorting every security
+    invested, pl, held = snapshot.security_pl()
+    candidates = np.flatnonzero(held)
+    gainers = heapq.nlargest(top, (i for i in candidates if pl[i] > 0), key=pl.__getitem__)
+    losers = heapq.nsmallest(top, (i for i in candidates if pl[i] < 0), key=pl.__getitem__)
+
+    def mover(i):
+        return {
+            "name": snapshot.security_names[i],
+            "profit": round(float(pl[i]), 2),
+            "percentage": round(float(pl[i] / invested[i] * 100), 2) if invested[i] > 0 else 0
+        }
+
+    absolute_returns = overview['unrealizedPL'] + overview['realizedPL'] + overview['dividends']
+    dates, values = portfolio_value_series()
     return jsonify({
-        "xirr": 12.5,
-        "absoluteReturns": 300000,
-        "percentageReturns": 30.0,
-        "dayChange": 2500,
-        "weekChange": 15000,
-        "monthChange": 50000,
-        "topGainers": [
-            {"name": "TCS", "profit": 12512.5, "percentage": 7.82},
-            {"name": "HDFC Bank", "profit": 9950, "percentage": 6.41}
-        ],
-        "topLosers": []
+        "xirr": overview['xirr'],
+        "absoluteReturns": round(absolute_returns, 2),
+        "percentageReturns": round(absolute_returns / overview['totalInvested'] * 100, 2) if overview['totalInvested'] > 0 else 0,
+        "dayChange": value_change(dates, values, 1),
+        "weekChange": value_change(dates, values, 7),
+        "monthChange": value_change(dates, values, 30),
+        "topGainers": [mover(i) for i in gainers],
+        "topLosers": [mover(i) for i in losers]
+    })
+
+@app.route('/api/v1/analytics/risk', methods=['GET'])
+def get_risk_analytics():
+    """Volatility, drawdown, Sharpe/Sortino and rolling CAGR per Historical column
+
+    Query params: source (sheet title), columns (comma-separated headers),
+    window (rolling volatility window in observations, default 30), riskFree (annual rate)
+    """
+    source = request.args.get('source')
+    if source and source not in HISTORY_SHEETS:
+        return jsonify({"error": f"Unknown history source: {source}"}), 400
+    window = max(request.args.get('window', 30, type=int), 2)
+    risk_free = request.args.get('riskFree', RISK_FREE_RATE, type=float)
+    columns = request.args.get('columns')
+    wanted = [c.strip() for c in columns.split(',')] if columns else None
+
+    metrics = get_risk_metrics(window, risk_free)
+    result = {
+        title: {name: m for name, m in sheet.items() if wanted is None or name in wanted}
+        for title, sheet in metrics.items()
+        if not source or title == source
+    }
+    return jsonify({"riskFreeRate": risk_free, "metrics": result})
+
+@app.route('/api/v1/analytics/income', methods=['GET'])
+def get_income_analytics():
+    """Dividend and interest income calendar with trailing-12-month yield
+
+    Query params: fy (e.g. FY2023-24, limits the monthly calendar to one financial year)
+    """
+    report = income_report(get_portfolio_snapshot())
+    fy = request.args.get('fy')
+    if not fy:
+        return jsonify(report)
+    try:
+        start = int(fy[2:6])
+    except ValueError:
+        return jsonify({"error": f"Invalid financial year: {fy}"}), 400
+    first, last = f"{start}-04", f"{start + 1}-03"
+    return jsonify({
+        **report,
+        'monthly': [m for m in report['monthly'] if first <= m['period'] <= last],
+        'financialYears': [y for y in report['financialYears'] if y['period'] == fy]
     })
 
 # Reports Endpoints  
-@app.route('/api/v1/reports/export', methods=['POST'])
+
+EXPORT_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+EXPORT_SECTIONS = ['transactions', 'goals', 'holdings', 'history']
+
+# Streamed exports are coalesced into chunks of about this many characters, so
+# a large export is a few hundred body messages rather than one per record
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 64 * 1024))
+
+# Column order for CSV export (JSON/NDJSON export the records as-is)
+EXPORT_COLUMNS = {
+    'transactions': ['id', 'date', 'buyDate', 'sellDate', 'assetClass', 'security', 'type', 'units',
+                     'pricePerUnit', 'currentPrice', 'totalAmount', 'value', 'sellValue', 'gainLoss',
+                     'realised', 'account', 'entity', 'notes'],
+    'goals': ['id', 'name', 'category', 'targetAmount', 'value', 'targetDate', 'progress'],
+    'holdings': ['security', 'assetClass', 'units', 'invested', 'currentValue', 'unrealizedPL',
+                 'unrealizedPLPercent', 'xirr']
+}
+
+def iter_export_section(section, date_from=None, date_to=None):
+    """Yield the records of one export section lazily, applying the date filters"""
+    if section == 'transactions':
+        records = read_transactions_from_sheets() if gs_client else MOCK_TRANSACTIONS
+        date_field = 'date'
+    elif section == 'goals':
+        records = read_goals_from_sheets() if gs_client else MOCK_GOALS
+        date_field = None
+    elif section == 'holdings':
+        records = get_portfolio_snapshot().holdings()
+        date_field = None
+    else:
+        records = read_historical_data()
+        date_field = 'date'
+
+    for record in records:
+        if date_field and (date_from or date_to):
+            record_date = parse_date(record.get(date_field) or record.get('buyDate'))
+            if record_date is None:
+                continue
+            if date_from and record_date < date_from:
+                continue
+            if date_to and record_date > date_to:
+                continue
+        yield record
+
+def buffer_export(parts, chunk_size=EXPORT_CHUNK_SIZE):
+    """Coalesce small string parts into chunks of at least chunk_size characters"""
+    import io
+    buffer = io.StringIO()
+    for part in parts:
+        buffer.write(part)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def generate_json_export(sections, date_from, date_to):
+    """Stream a single JSON object, one record at a time"""
+    yield '{"exportDate": ' + json.dumps(datetime.now().isoformat())
+    for section in sections:
+        yield ', ' + json.dumps(section) + ': ['
+        first = True
+        for record in iter_export_section(section, date_from, date_to):
+            yield ('' if first else ', ') + json.dumps(record, default=str)
+            first = False
+        yield ']'
+    yield '}'
+
+def generate_ndjson_export(sections, date_from, date_to):
+    """Stream one JSON document per line, tagged with its section"""
+    for section in sections:
+        for record in iter_export_section(section, date_from, date_to):
+            yield json.dumps({'section': section, **record}, default=str) + '\n'
+
+def _chain_first(first, rest):
+    """Put an already-consumed first item back in front of an iterator"""
+    yield first
+    yield from rest
+
+def generate_csv_export(sections, date_from, date_to):
+    """Stream CSV, one block per section separated by a blank line"""
+    import csv
+    import io
+    buffer = io.StringIO()
+
+    def flush():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return chunk
+
+    for index, section in enumerate(sections):
+        records = iter_export_section(section, date_from, date_to)
+        columns = EXPORT_COLUMNS.get(section)
+        if columns is None:
+            # History columns depend on the sheet headers, so take them from the first row
+            first = next(records, None)
+            if first is None:
+                continue
+            columns = list(first.keys())
+            records = _chain_first(first, records)
+
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore', restval='')
+        if index > 0:
+            buffer.write('\r\n')
+        buffer.write(f"# {section}\r\n")
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                yield flush()
+    if buffer.tell():
+        yield flush()
+
+@app.route('/api/v1/reports/capital-gains', methods=['GET'])
+def get_capital_gains():
+    """FIFO-matched realised capital gains per financial year
+
+    Query params: fy (e.g. FY2023-24, limits the report and includes its matched lots)
+    """
+    fy = request.args.get('fy')
+    snapshot = get_portfolio_snapshot()
+    report = capital_gains_report(snapshot)
+    if not fy:
+        return jsonify({
+            "financialYears": report['financialYears'],
+            "unmatchedSells": report['unmatchedSells']
+        })
+    year = next((y for y in report['financialYears'] if y['fy'] == fy), None)
+    return jsonify({
+        "financialYears": [year] if year else [],
+        "lots": capital_gains_lots(snapshot, fy) if year else [],
+        "unmatchedSells": report['unmatchedSells']
+    })
+
+@app.route('/api/v1/reports/export', methods=['GET', 'POST'])
 def export_data():
-    """Export portfolio data as JSON/CSV"""
-    format_type = request.json.get('format', 'json')
-    
-    data = {
-        "portfolio": MOCK_PORTFOLIO_DATA,
-        "transactions": MOCK_TRANSACTIONS,
-        "goals": MOCK_GOALS,
-        "exportDate": datetime.now().isoformat()
+    """Export portfolio data as streamed JSON, NDJSON or CSV
+
+    Options (JSON body or query string):
+        format: json | ndjson | csv
+        sections: list or comma-separated subset of transactions, goals, holdings, history
+        from / to: date range (YYYY-MM-DD) applied to transactions and history
+    """
+    options = dict(request.args)
+    if request.method == 'POST' and request.is_json:
+        options.update(request.get_json(silent=True) or {})
+
+    format_type = str(options.get('format', 'json')).lower()
+    if format_type not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported export format: {format_type}"}), 400
+
+    sections = options.get('sections') or ['transactions', 'goals', 'holdings']
+    if isinstance(sections, str):
+        sections = [s.strip() for s in sections.split(',') if s.strip()]
+    unknown = [s for s in sections if s not in EXPORT_SECTIONS]
+    if unknown:
+        return jsonify({"error": f"Unknown export sections: {', '.join(unknown)}"}), 400
+
+    date_from = parse_date(options.get('from'))
+    date_to = parse_date(options.get('to'))
+    if (options.get('from') and not date_from) or (options.get('to') and not date_to):
+        return jsonify({"error": "Invalid date filter, expected YYYY-MM-DD"}), 400
+
+    generators = {
+        'json': generate_json_export,
+        'ndjson': generate_ndjson_export,
+        'csv': generate_csv_export
     }
-    
-    if format_type == 'json':
-        return jsonify(data)
+    body = buffer_export(generators[format_type](sections, date_from, date_to))
+    filename = f"wealth-export-{datetime.now().strftime('%Y%m%d')}.{format_type}"
+    return Response(
+        stream_with_context(body),
+        mimetype=EXPORT_FORMATS[format_type],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+# Price Endpoints
+@app.route('/api/v1/prices', methods=['GET', 'POST'])
+def handle_prices():
+    """List the local price table, or upload prices as JSON or CSV (Security, Price, Date)"""
+    if request.method == 'GET':
+        price_store.ensure_loaded()
+        return jsonify({
+            "version": price_store.version,
+            "prices": [{"security": security, **entry} for security, entry in sorted(price_store.prices.items())]
+        })
+
+    upload = request.files.get('file')
+    if upload is not None or request.mimetype == 'text/csv':
+        import csv
+        import io
+        text = upload.read().decode('utf-8-sig') if upload is not None else request.get_data(as_text=True)
+        records = list(csv.DictReader(io.StringIO(text)))
     else:
-        return jsonify({"error": "CSV export not implemented"}), 501
+        data = request.get_json(silent=True)
+        records = data.get('prices', []) if isinstance(data, dict) else data
+    if not isinstance(records, list):
+        return jsonify({"error": "Expected a list of prices"}), 400
+
+    price_store.ensure_loaded()
+    updated, errors = price_store.update(records, 'upload')
+    return jsonify({
+        "success": not errors,
+        "updated": updated,
+        "errors": errors,
+        "version": price_store.version
+    }), (200 if updated or not errors else 400)
+
+@app.route('/api/v1/prices/reload', methods=['POST'])
+def reload_prices():
+    """Reload the price table from the Prices worksheet"""
+    updated = price_store.load_from_sheet()
+    return jsonify({"success": True, "updated": updated, "version": price_store.version})
 
 # Settings Endpoints
 @app.route('/api/v1/settings/sheets', methods=['GET'])
@@ -1521,69 +4783,197 @@ def get_sheets_settings():
     return jsonify({
         "connected": gs_client is not None,
         "mode": "mock" if not gs_client else "google-sheets",
-        "sheetName": os.getenv('SHEET_NAME', 'Not configured')
+        "sheetName": os.getenv('SHEET_NAME', 'Not configured'),
+        "client": sheets_guard.get_stats()
     })
 
 
 
 def read_historical_data():
-    """Read data from Historical and Historical-Other sheets"""
-    if not gs_client:
-        return []
-    
-    try:
-        sheet_name = os.getenv('SHEET_NAME', 'WealthManagement')
-        workbook = gs_client.open(sheet_name)
-        
-        all_data = []
-        
-        # Define sheets to read
-        target_sheets = ['Historical', 'Historical-Other']
-        
-        for sheet_title in target_sheets:
-            try:
-                worksheet = workbook.worksheet(sheet_title)
-                rows = worksheet.get_all_values()
-                
-                if not rows or len(rows) < 2:
-                    continue
-                    
-                headers = rows[0]
-                
-                for r in rows[1:]:
-                    if not r or not r[0]:
-                        continue
-                        
-                    date_val = r[0]
-                    entry = {'date': date_val, 'type': sheet_title}
-                    
-                    # Parse numerical columns
-                    for i in range(1, len(r)):
-                        header = headers[i] if i < len(headers) else f"Column_{i}"
-                        val_str = r[i].replace('₹', '').replace(',', '').strip()
-                        try:
-                            val = float(val_str) if val_str else 0.0
-                            entry[header] = val
-                        except ValueError:
-                            entry[header] = 0.0
-                            
-                    all_data.append(entry)
-                    
-            except Exception as e:
-                print(f"Warning: Could not read sheet {sheet_title}: {e}")
-                
-        return all_data
-
-    except Exception as e:
-        print(f"Error reading historical data: {e}")
-        return []
+    """Read data from Historical and Historical-Other sheets as row dicts"""
+    frames = get_history_frames()
+    all_data = []
+    for sheet_title in HISTORY_SHEETS:
+        if sheet_title in frames:
+            all_data.extend(frames[sheet_title].to_rows())
+    return all_data
 
 @app.route('/api/v1/history', methods=['GET'])
 def get_historical_data():
-    """Get historical performance data"""
-    data = read_historical_data()
+    """Get historical performance data
+
+    Query params: source (sheet title), columns (comma-separated headers),
+    from / to (YYYY-MM-DD), format (rows, the default, or columns)
+    """
+    source = request.args.get('source')
+    if source and source not in HISTORY_SHEETS:
+        return jsonify({"error": f"Unknown history source: {source}"}), 400
+    columns = request.args.get('columns')
+    start = parse_date(request.args.get('from'))
+    end = parse_date(request.args.get('to'))
+    if (request.args.get('from') and not start) or (request.args.get('to') and not end):
+        return jsonify({"error": "Invalid date filter, expected YYYY-MM-DD"}), 400
+    layout = request.args.get('format', 'rows')
+
+    frames = get_history_frames()
+    selected = []
+    for title in ([source] if source else HISTORY_SHEETS):
+        frame = frames.get(title)
+        if frame is None:
+            continue
+        frame = frame.slice(start, end)
+        if columns:
+            frame = frame.select([c.strip() for c in columns.split(',')])
+        selected.append(frame)
+
+    if layout == 'columns':
+        return jsonify({"history": {
+            frame.source: {
+                "dates": np.datetime_as_string(frame.dates, unit='D').tolist(),
+                "columns": {name: column.tolist() for name, column in frame.columns.items()}
+            }
+            for frame in selected
+        }})
+
+    data = []
+    for frame in selected:
+        data.extend(frame.to_rows())
     return jsonify({"history": data})
 
 
+# ============================================================
+# Async Serving (ASGI)
+# ============================================================
+
+# `uvicorn app:asgi_app` serves the same routes from an event loop. The route handlers stay
+# synchronous and run through a2wsgi's WSGI adapter on a bounded thread pool (ASGI_WORKERS);
+# what moves onto the loop is the Sheets I/O: cold sheet fetches are awaited before a
+# handler is scheduled, so a slow Sheets response holds no handler thread, and the event
+# stream is served natively so idle subscribers hold none either.
+ASGI_WORKERS = int(os.environ.get('ASGI_WORKERS', 16))
+_asgi_handlers = None
+
+# Sheets read by GET routes, first matching path prefix wins
+ROUTE_SHEETS = [
+    ('/api/v1/dashboard', ('transactions', 'goals', 'history')),
+    ('/api/v1/goals/projections', ('transactions', 'goals', 'history')),
+    ('/api/v1/goals', ('goals', 'transactions')),
+    ('/api/v1/portfolio/performance', ('transactions', 'history')),
+    ('/api/v1/analytics/summary', ('transactions', 'history')),
+    ('/api/v1/analytics/risk', ('transactions', 'history')),
+    ('/api/v1/history', ('history',)),
+    ('/api/v1/portfolio', ('transactions',)),
+    ('/api/v1/transactions', ('transactions',)),
+    ('/api/v1/analytics', ('transactions',)),
+    ('/api/v1/reports', ('transactions',)),
+]
+
+# One in-flight fetch per sheet; concurrent requests for a cold sheet await the same future
+_inflight_fetches = {}
+_inflight_lock = threading.Lock()
+_connect_future = None
+
+def _shared_fetch(key):
+    with _inflight_lock:
+        future = _inflight_fetches.get(key)
+        if future is None:
+            future = _fetch_pool.submit(SHEET_READERS[key])
+            _inflight_fetches[key] = future
+            future.add_done_callback(lambda done: _inflight_fetches.pop(key, None))
+    return future
+
+async def prefetch_async(keys):
+    """Await cold sheet reads without tying up a handler thread"""
+    global _connect_future
+    if not _sheets_ready.is_set():
+        with _inflight_lock:
+            if _connect_future is None:
+                _connect_future = _fetch_pool.submit(connect_google_sheets)
+        await asyncio.wrap_future(_connect_future)
+    if not gs_client:
+        return
+    cold = [asyncio.wrap_future(_shared_fetch(key)) for key in keys if not cache_manager.is_fresh(key)]
+    if cold:
+        # A failed or slow fetch is retried (or served stale) by the handler itself
+        await asyncio.wait(cold, timeout=SHEETS_FETCH_TIMEOUT)
+
+def _wsgi_input_terminated(environ, start_response):
+    """a2wsgi's request body reads to the end of the ASGI stream, even without a Content-Length"""
+    environ['wsgi.input_terminated'] = True
+    return app.wsgi_app(environ, start_response)
+
+def asgi_handlers():
+    """The a2wsgi adapter running the Flask routes, created on first use (a2wsgi is only needed for ASGI)"""
+    global _asgi_handlers
+    if _asgi_handlers is None:
+        from a2wsgi import WSGIMiddleware
+        _asgi_handlers = WSGIMiddleware(_wsgi_input_terminated, workers=ASGI_WORKERS)
+    return _asgi_handlers
+
+async def stream_events_asgi(scope, receive, send):
+    """/api/v1/events served on the event loop, so idle subscribers hold no handler thread"""
+    from urllib.parse import parse_qs
+    headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope.get('headers', [])}
+    query = {name: values[-1] for name, values in parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+    key = headers.get('x-api-key', query.get('api_key'))
+    if key != API_KEY and (API_KEY or not app.debug):
+        logger.warning("Auth failed for GET /api/v1/events: %s API key", 'invalid' if key else 'missing',
+                       extra={'event': 'auth.failed'})
+        await send({'type': 'http.response.start', 'status': 401, 'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': b'{"error":"Unauthorized: Invalid or missing API Key"}\n'})
+        return
+
+    loop = asyncio.get_running_loop()
+    stream = EventStream(headers.get('last-event-id'), query.get('aggregates'))
+    await prefetch_async(('transactions',) if stream.aggregates else ())
+    response_headers = [(b'content-type', b'text/event-stream; charset=utf-8'), (b'cache-control', b'no-cache')]
+    origin = allowed_origin(headers.get('origin'))
+    if origin and headers.get('origin'):
+        response_headers.append((b'access-control-allow-origin', origin.encode('latin-1')))
+        if origin != '*':
+            response_headers.append((b'vary', b'Origin'))
+    await send({'type': 'http.response.start', 'status': 200, 'headers': response_headers})
+    # Rendering may build the snapshot, so it runs on the handler pool
+    chunks = await loop.run_in_executor(asgi_handlers().executor, stream.start)
+    await send({'type': 'http.response.body', 'body': ''.join(chunks).encode('utf-8'), 'more_body': True})
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+    disconnected = asyncio.ensure_future(wait_for_disconnect())
+    try:
+        while True:
+            waiting = asyncio.ensure_future(data_events.wait_async(stream.seq, EVENTS_HEARTBEAT))
+            await asyncio.wait({waiting, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                waiting.cancel()
+                await asyncio.wait({waiting})
+                return
+            stream.seq, event = waiting.result()
+            chunk = ": keep-alive\n\n" if event is None else await loop.run_in_executor(asgi_handlers().executor, stream.render, event)
+            await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+    finally:
+        disconnected.cancel()
+
+async def asgi_app(scope, receive, send):
+    """ASGI entry point wrapping the Flask routes"""
+    if scope['type'] == 'http' and scope['method'] == 'GET':
+        if scope['path'] == '/api/v1/events':
+            await stream_events_asgi(scope, receive, send)
+            return
+        if scope['path'] != '/':
+            keys = next((keys for prefix, keys in ROUTE_SHEETS if scope['path'].startswith(prefix)), ())
+            await prefetch_async(keys)
+    await asgi_handlers()(scope, receive, send)
+
+
+# Start connecting to Google Sheets without holding up startup (see SHEETS_CONNECT)
+if SHEETS_CONNECT == 'eager':
+    connect_google_sheets()
+elif SHEETS_CONNECT == 'background':
+    threading.Thread(target=connect_google_sheets, name='sheets-connect', daemon=True).start()
+if PRECOMPUTE:
+    precompute_scheduler.start()
+record_startup_phase('module ready', _module_started)
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
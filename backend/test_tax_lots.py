@@ -0,0 +1,180 @@
+"""Tests for FIFO tax-lot matching and the capital gains report"""
+import os
+from datetime import date, timedelta
+
+import pytest
+
+# Stay in mock mode: no Sheets connection at import
+os.environ.setdefault('SHEETS_CONNECT', 'lazy')
+
+import app  # noqa: E402
+
+
+def buy(day, units, amount, security='ACME', asset_class='Equity', account='Main'):
+    return {'type': 'Invest', 'assetClass': asset_class, 'security': security, 'account': account,
+            'units': units, 'totalAmount': amount, 'buyDate': str(day), 'realised': 'FALSE'}
+
+
+def sell(day, units, proceeds, security='ACME', asset_class='Equity', account='Main'):
+    return {'type': 'Sell', 'assetClass': asset_class, 'security': security, 'account': account,
+            'units': units, 'sellValue': proceeds, 'sellDate': str(day), 'realised': 'FALSE'}
+
+
+def matched(transactions):
+    """Matched lots as a list of dicts (in match order) plus the unmatched sells"""
+    lots, unmatched = app.match_tax_lots(app.PortfolioSnapshot(transactions))
+    rows = [{name: lots[name][i].item() for name in lots} for i in range(len(lots['units']))]
+    return rows, unmatched
+
+
+def test_partial_sells_consume_lots_oldest_first():
+    lots, unmatched = matched([
+        buy(date(2022, 1, 1), 10, 1000),
+        buy(date(2022, 6, 1), 10, 1200),
+        sell(date(2023, 3, 1), 15, 2250),
+        sell(date(2023, 4, 1), 5, 800),
+    ])
+
+    assert [(lot['buy_row'], lot['sell_row'], lot['units']) for lot in lots] == [(0, 2, 10), (1, 2, 5), (1, 3, 5)]
+    assert [lot['cost'] for lot in lots] == pytest.approx([1000, 600, 600])
+    assert [lot['proceeds'] for lot in lots] == pytest.approx([1500, 750, 800])
+    assert [lot['long_term'] for lot in lots] == [True, False, False]
+    assert unmatched == []
+
+
+def test_sell_beyond_open_lots_is_reported_unmatched():
+    lots, unmatched = matched([
+        buy(date(2022, 1, 1), 4, 400),
+        sell(date(2022, 2, 1), 10, 1100),
+    ])
+
+    assert [lot['units'] for lot in lots] == [4]
+    assert lots[0]['proceeds'] == pytest.approx(440)
+    assert unmatched == [(1, pytest.approx(6))]
+
+
+def test_lots_are_matched_per_security_and_account():
+    lots, unmatched = matched([
+        buy(date(2022, 1, 1), 5, 500, account='Main'),
+        buy(date(2022, 2, 1), 5, 700, account='Spouse'),
+        sell(date(2022, 3, 1), 5, 800, account='Spouse'),
+    ])
+
+    assert [(lot['buy_row'], lot['sell_row']) for lot in lots] == [(1, 2)]
+    assert unmatched == []
+
+
+def test_same_day_buy_is_matched_before_the_sell():
+    # The sell is listed first, but same-day buys are processed before sells
+    lots, unmatched = matched([
+        sell(date(2023, 5, 10), 3, 330),
+        buy(date(2023, 5, 10), 3, 300),
+    ])
+
+    assert [(lot['buy_row'], lot['sell_row'], lot['holding_days']) for lot in lots] == [(1, 0, 0)]
+    assert lots[0]['long_term'] is False
+    assert unmatched == []
+
+
+def test_same_day_sell_takes_older_lot_first():
+    lots, _ = matched([
+        buy(date(2022, 1, 1), 2, 200),
+        buy(date(2023, 5, 10), 2, 260),
+        sell(date(2023, 5, 10), 3, 450),
+    ])
+
+    assert [(lot['buy_row'], lot['units']) for lot in lots] == [(0, 2), (1, 1)]
+    assert [lot['long_term'] for lot in lots] == [True, False]
+
+
+@pytest.mark.parametrize('asset_class, threshold', [
+    ('Equity', 365),
+    ('ETF', 365),
+    ('Gold', 730),
+    ('SGB', 730),
+    ('Debt Fund', 1095),
+    ('Real Estate', app.DEFAULT_LONG_TERM_DAYS),
+])
+def test_long_term_cutoff_by_asset_class(asset_class, threshold):
+    bought = date(2020, 4, 1)
+    lots, _ = matched([
+        buy(bought, 2, 200, security='AT', asset_class=asset_class),
+        sell(bought + timedelta(days=threshold), 1, 150, security='AT', asset_class=asset_class),
+        buy(bought, 2, 200, security='AFTER', asset_class=asset_class),
+        sell(bought + timedelta(days=threshold + 1), 1, 150, security='AFTER', asset_class=asset_class),
+    ])
+
+    assert app.long_term_days(asset_class) == threshold
+    assert [(lot['holding_days'], lot['long_term']) for lot in lots] == [(threshold, False), (threshold + 1, True)]
+
+
+def test_realised_row_is_its_own_buy_and_sell():
+    lots, unmatched = matched([{
+        'type': 'Invest', 'assetClass': 'Equity', 'security': 'ACME', 'account': 'Main', 'units': 10,
+        'totalAmount': 1000, 'sellValue': 1300, 'buyDate': '2021-01-01', 'sellDate': '2022-06-30',
+        'realised': 'TRUE'
+    }])
+
+    assert [(lot['buy_row'], lot['sell_row'], lot['units']) for lot in lots] == [(0, 0, 10)]
+    assert lots[0]['proceeds'] - lots[0]['cost'] == pytest.approx(300)
+    assert lots[0]['long_term'] is True
+    assert unmatched == []
+
+
+def test_capital_gains_split_by_financial_year_and_term():
+    snapshot = app.PortfolioSnapshot([
+        buy(date(2022, 1, 1), 10, 1000),
+        buy(date(2023, 1, 1), 10, 1000, security='GLD', asset_class='Gold'),
+        sell(date(2023, 3, 31), 5, 700),                                    # FY2022-23, long term
+        sell(date(2023, 4, 1), 5, 400),                                     # FY2023-24, long term loss
+        sell(date(2024, 3, 1), 10, 1500, security='GLD', asset_class='Gold'),  # FY2023-24, short term
+    ])
+    report = app.capital_gains_report(snapshot)
+
+    years = {year['fy']: year for year in report['financialYears']}
+    assert list(years) == ['FY2022-23', 'FY2023-24']
+    assert years['FY2022-23']['longTerm'] == pytest.approx(200)
+    assert years['FY2022-23']['shortTerm'] == pytest.approx(0)
+    assert years['FY2023-24']['longTerm'] == pytest.approx(-100)
+    assert years['FY2023-24']['shortTerm'] == pytest.approx(500)
+    assert years['FY2023-24']['byAssetClass'] == {
+        'Equity': {'shortTerm': 0.0, 'longTerm': -100.0},
+        'Gold': {'shortTerm': 500.0, 'longTerm': 0.0},
+    }
+    assert report['unmatchedSells'] == []
+
+    lots = app.capital_gains_lots(snapshot, 'FY2023-24')
+    assert [(lot['security'], lot['term'], lot['gain']) for lot in lots] == [('ACME', 'longTerm', -100), ('GLD', 'shortTerm', 500)]
+
+
+def test_holding_period_matches_lot_matching():
+    lots, _ = matched([buy(date(2021, 2, 15), 1, 100), sell(date(2023, 8, 1), 1, 140)])
+
+    assert app.holding_period_days('2021-02-15', '2023-08-01') == lots[0]['holding_days']
+    assert app.holding_period_days('2021-02-15', '') == ''
+
+
+def test_written_row_fills_each_column_once(monkeypatch):
+    written = {}
+
+    class Worksheet:
+        def append_row(self, row):
+            written['row'] = row
+
+    def get_or_create_worksheet(workbook_name, worksheet_name, headers):
+        written['headers'] = headers
+        return Worksheet()
+
+    monkeypatch.setattr(app, 'gs_client', object())
+    monkeypatch.setattr(app, 'get_or_create_worksheet', get_or_create_worksheet)
+    monkeypatch.setattr(app, 'invalidate_cache', lambda key: None)
+    assert app.write_transaction_to_sheets({
+        'id': 'T1', 'assetClass': 'Equity', 'security': 'ACME', 'type': 'Invest', 'units': 10,
+        'pricePerUnit': 100, 'buyDate': '2021-02-15', 'sellDate': '2023-08-01'
+    })
+
+    assert len(written['row']) == len(written['headers'])
+    row = dict(zip(written['headers'], written['row']))
+    assert row['Security'] == 'ACME'
+    assert row['Quantity'] == 10
+    assert row['Holding Period'] == app.holding_period_days('2021-02-15', '2023-08-01')
@@ -33,7 +33,7 @@ import {
     Refresh,
     SwapHoriz as SwapHorizIcon,
 } from '@mui/icons-material';
-import { getPortfolioOverview, getPortfolioPerformance } from '../services/api';
+import { getDashboard } from '../services/api';
 
 const COLORS = ['#008577', '#009688', '#4db6ac', '#80cbc4', '#b2dfdb', '#e0f2f1'];
 
@@ -62,12 +62,10 @@ function Dashboard() {
             if (isRefresh) {
                 setRefreshing(true);
             }
-            const [portfolioRes, performanceRes] = await Promise.all([
-                getPortfolioOverview(),
-                getPortfolioPerformance(),
-            ]);
-            setPortfolio(portfolioRes.data);
-            setPerformance(performanceRes.data);
+            const response = await getDashboard(['overview', 'allocation', 'performance']);
+            const { overview, allocation, performance: performanceData } = response.data;
+            setPortfolio({ ...overview, allocation, assetBreakdown: allocation });
+            setPerformance(performanceData);
             setLoading(false);
             if (isRefresh) {
                 setRefreshing(false);
@@ -23,6 +23,9 @@ export const getHoldings = (assetClass, goal, type) => {
     return api.get(`/portfolio/holdings${queryString ? `?${queryString}` : ''}`);
 };
 
+// Dashboard (bundled sections computed from one snapshot)
+export const getDashboard = (include) => api.get('/dashboard', { params: include ? { include: include.join(',') } : {} });
+
 // Transactions
 export const getTransactions = (page = 1, limit = 50) => api.get(`/transactions?page=${page}&limit=${limit}`);
 export const createTransaction = (data) => api.post('/transactions', data);